@@ -3,18 +3,42 @@ import pandas as pd
 import numpy as np
 import logging
 import time
+import math
+import queue
+import itertools
+import threading
+import hashlib
+import gzip
+import zlib
+import sqlite3
+import json
+import re
+import sys
+import random
+import hmac
+import collections
+from concurrent.futures import Future
 from functools import wraps
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, has_request_context, g
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from flask_caching import Cache
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from tokenizers import Tokenizer
 import torch
 from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, confusion_matrix
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 
+try:
+	import pyarrow as pa
+	import pyarrow.compute as pc
+	import pyarrow.parquet as pq
+except ImportError:  # Parquet / Arrow IPC uploads are optional
+	pa = None
+
 # Load environment variables
 load_dotenv()
 
@@ -40,31 +64,354 @@ logger = logging.getLogger(__name__)
 # --- Configuration ---
 MODEL_DIR = os.getenv('MODEL_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), '../sentiment_model')))
 MODEL_NAME = os.getenv('MODEL_NAME', 'distilbert-base-uncased')
-ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_FILE_EXTENSIONS', 'csv').split(','))
+ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_FILE_EXTENSIONS', 'csv,parquet,arrow,feather').split(','))
 MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE_MB', 10)) * 1024 * 1024  # Convert to bytes
+MAX_TEXT_CHARS = 10000  # Per-review character limit
+MAX_SEQUENCE_LENGTH = int(os.getenv('MAX_SEQUENCE_LENGTH', 256))  # Tokens the model sees per review
+TOKENIZER_CHARS_PER_TOKEN = int(os.getenv('TOKENIZER_CHARS_PER_TOKEN', 8))  # Pre-trim bound before tokenizing
+SENTENCE_MAX_REVIEWS = int(os.getenv('SENTENCE_MAX_REVIEWS', 50))  # Reviews per sentence-breakdown request
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', 1))  # Concurrent forward passes per process
+ADMISSION_MAX_WAIT = float(os.getenv('ADMISSION_MAX_WAIT_SECONDS', 10))  # Interactive lane
+ADMISSION_MAX_WAIT_BULK = float(os.getenv('ADMISSION_MAX_WAIT_BULK_SECONDS', 45))  # CSV uploads
+REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT_SECONDS', 60))  # Deadline per request (ASGI server)
+REQUEST_TIMEOUT_BULK = float(os.getenv('REQUEST_TIMEOUT_BULK_SECONDS', 900))  # Deadline for CSV uploads
+GZIP_MIN_SIZE = int(os.getenv('GZIP_MIN_SIZE', 1024))  # Smaller bodies are sent uncompressed
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))  # Fraction of requests stack-sampled
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL_MS', 5)) / 1000
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 2000))  # Slower requests keep their stage breakdown
+PROFILE_BUFFER_SIZE = int(os.getenv('PROFILE_BUFFER_SIZE', 200))
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')  # Empty disables the admin endpoints
 
 # --- Load model and tokenizer ---
 logger.info("Loading NLP model...")
 try:
 	# Try loading local model first
-	tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
+	tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR, use_fast=True)
 	model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR)
+	model_loaded_from = MODEL_DIR
 	logger.info(f"✅ Loaded model from {MODEL_DIR}")
 except Exception as e:
 	# If local model not found, download base model
 	logger.warning(f"Local model not found: {str(e)}")
 	logger.info(f"📥 Downloading base model: {MODEL_NAME}")
-	tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+	tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, use_fast=True)
 	model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME, num_labels=2)
+	model_loaded_from = None
 	logger.info(f"✅ Model downloaded. Note: This is an untrained base model.")
 	logger.info(f"   Run scripts/model_training.py to train on your dataset for accurate predictions.")
 
 model.eval()
 
+def compute_model_version():
+	"""Short content hash of the loaded model files, used to key stored predictions"""
+	if os.getenv('MODEL_VERSION'):
+		return os.getenv('MODEL_VERSION')
+	if model_loaded_from is None:
+		return f'{MODEL_NAME}-base'
+	digest = hashlib.sha256()
+	for name in sorted(os.listdir(model_loaded_from)):
+		path = os.path.join(model_loaded_from, name)
+		if not os.path.isfile(path):
+			continue
+		digest.update(name.encode('utf-8'))
+		with open(path, 'rb') as f:
+			for block in iter(lambda: f.read(1024 * 1024), b''):
+				digest.update(block)
+	return digest.hexdigest()[:12]
+
+MODEL_VERSION = compute_model_version()
+logger.info(f"Model version: {MODEL_VERSION}")
+
+# --- Tokenization ---
+if tokenizer.is_fast:
+	# Private copy of the Rust tokenizer (tokenizer.json), configured once for truncation only
+	encoder = Tokenizer.from_str(tokenizer.backend_tokenizer.to_str())
+	encoder.no_padding()
+	encoder.enable_truncation(MAX_SEQUENCE_LENGTH)
+	logger.info("Using fast (Rust) tokenizer with batched encoding")
+else:
+	encoder = None
+	logger.warning("⚠️ No fast tokenizer available (tokenizer.json missing), falling back to the slow Python tokenizer")
+
+def _pretrim(text, limit):
+	"""Cut text at the last space before `limit` chars; returns None if no safe cut exists"""
+	if len(text) <= limit:
+		return None
+	cut = text.rfind(' ', 0, limit)
+	return text[:cut] if cut > 0 else None
+
+def encode_texts(texts):
+	"""Token ids (truncated, unpadded) for a whole chunk of texts in one call
+
+	Texts are first trimmed at a word boundary to MAX_SEQUENCE_LENGTH *
+	TOKENIZER_CHARS_PER_TOKEN characters. A word-boundary prefix tokenizes to a
+	prefix of the full token sequence, so a trimmed text that still fills the
+	window gives exactly the same ids; the rare one that does not is re-encoded
+	in full. The Rust encoder works on the whole chunk in parallel.
+	"""
+	if encoder is None:
+		return tokenizer(texts, truncation=True, max_length=MAX_SEQUENCE_LENGTH)['input_ids']
+	limit = MAX_SEQUENCE_LENGTH * TOKENIZER_CHARS_PER_TOKEN
+	trimmed = [_pretrim(t, limit) for t in texts]
+	encodings = encoder.encode_batch([t if c is None else c for t, c in zip(texts, trimmed)])
+	ids = [e.ids for e in encodings]
+	redo = [i for i, c in enumerate(trimmed) if c is not None and len(ids[i]) < MAX_SEQUENCE_LENGTH]
+	if redo:
+		for i, e in zip(redo, encoder.encode_batch([texts[i] for i in redo])):
+			ids[i] = e.ids
+	return ids
+
+class _EncodingBuffers(threading.local):
+	"""Two preallocated id/mask buffers per thread, used alternately so one batch can be
+	packed while the previous one is still in the model"""
+
+	def __init__(self):
+		self.slots = [None, None]
+		self.next = 0
+
+	def take(self, size):
+		slot = self.next
+		self.next ^= 1
+		buffers = self.slots[slot]
+		if buffers is None or buffers[0].size < size:
+			buffers = (np.empty(size, dtype=np.int64), np.empty(size, dtype=np.int64))
+			self.slots[slot] = buffers
+		return buffers
+
+_encoding_buffers = _EncodingBuffers()
+_pad_token_id = tokenizer.pad_token_id or 0
+
+def pack_batch(batch_ids):
+	"""Pad one batch of id lists into model inputs backed by this thread's reusable buffers"""
+	rows, longest = len(batch_ids), max((len(ids) for ids in batch_ids), default=0)
+	ids_buffer, mask_buffer = _encoding_buffers.take(rows * longest)
+	input_ids = ids_buffer[:rows * longest].reshape(rows, longest)
+	attention_mask = mask_buffer[:rows * longest].reshape(rows, longest)
+	input_ids.fill(_pad_token_id)
+	attention_mask.fill(0)
+	left = tokenizer.padding_side == 'left'
+	for row, ids in enumerate(batch_ids):
+		span = slice(longest - len(ids), longest) if left else slice(0, len(ids))
+		input_ids[row, span] = ids
+		attention_mask[row, span] = 1
+	inputs = {'input_ids': torch.from_numpy(input_ids), 'attention_mask': torch.from_numpy(attention_mask)}
+	if 'token_type_ids' in tokenizer.model_input_names:
+		inputs['token_type_ids'] = torch.zeros_like(inputs['input_ids'])
+	return inputs
+
+# --- Inference Scheduling ---
+LANE_INTERACTIVE = 0  # Single reviews, always served first
+LANE_BULK = 1  # CSV batch work
+
+class PriorityInferenceExecutor:
+	"""Dedicated forward-pass threads that drain the interactive lane before bulk work"""
+
+	def __init__(self, max_workers):
+		self._queue = queue.PriorityQueue()
+		self._counter = itertools.count()  # FIFO order within a lane
+		for i in range(max_workers):
+			threading.Thread(target=self._worker, name=f'inference-{i}', daemon=True).start()
+
+	def submit(self, fn, *args, lane=LANE_INTERACTIVE):
+		future = Future()
+		self._queue.put((lane, next(self._counter), future, fn, args))
+		return future
+
+	def _worker(self):
+		while True:
+			_, _, future, fn, args = self._queue.get()
+			if not future.set_running_or_notify_cancel():
+				continue
+			try:
+				future.set_result(fn(*args))
+			except BaseException as e:
+				future.set_exception(e)
+
+class ServerOverloaded(Exception):
+	"""Raised when the estimated queue wait exceeds the lane's deadline"""
+
+	def __init__(self, retry_after):
+		super().__init__(f'Estimated wait exceeds deadline, retry after {retry_after}s')
+		self.retry_after = retry_after
+
+class AdmissionController:
+	"""Admit requests by queued tokens and the measured model service time"""
+
+	def __init__(self, workers, max_wait, max_wait_bulk, deadline, deadline_bulk, seconds_per_token=0.0005):
+		self._lock = threading.Lock()
+		self._workers = workers
+		self._deadline = {LANE_INTERACTIVE: deadline, LANE_BULK: deadline_bulk}
+		# Queue wait can never use more than the request's whole deadline
+		self._max_wait = {LANE_INTERACTIVE: min(max_wait, deadline), LANE_BULK: min(max_wait_bulk, deadline_bulk)}
+		self._queued = {LANE_INTERACTIVE: 0, LANE_BULK: 0}
+		self.seconds_per_token = seconds_per_token  # EWMA, refined by observe()
+
+	def estimated_wait(self, lane):
+		"""Seconds until work queued ahead in `lane` is served; interactive work skips the bulk lane"""
+		with self._lock:
+			ahead = self._queued[LANE_INTERACTIVE]
+			if lane == LANE_BULK:
+				ahead += self._queued[LANE_BULK]
+			return ahead * self.seconds_per_token / self._workers
+
+	def admit(self, lane, tokens):
+		# An idle server always admits, whatever the request's size (bounded by the upload
+		# limit), so the EWMA keeps learning while others are shed. Behind a queue, the
+		# request must also finish within its lane's deadline or it would only end in a 504
+		wait = self.estimated_wait(lane)
+		if wait > self._max_wait[lane]:
+			raise ServerOverloaded(max(1, math.ceil(wait - self._max_wait[lane])))
+		if wait > 0 and wait + tokens * self.seconds_per_token / self._workers > self._deadline[lane]:
+			raise ServerOverloaded(max(1, math.ceil(wait)))
+		with self._lock:
+			self._queued[lane] += tokens
+
+	def release(self, lane, tokens):
+		with self._lock:
+			self._queued[lane] = max(0, self._queued[lane] - tokens)
+
+	def observe(self, tokens, seconds, alpha=0.2):
+		if tokens <= 0:
+			return
+		with self._lock:
+			self.seconds_per_token += alpha * (seconds / tokens - self.seconds_per_token)
+
+	def snapshot(self):
+		with self._lock:
+			return {
+				'queued_tokens_interactive': self._queued[LANE_INTERACTIVE],
+				'queued_tokens_bulk': self._queued[LANE_BULK],
+				'seconds_per_token': self.seconds_per_token
+			}
+
+# Forward passes run on a dedicated executor so request threads (and the ASGI
+# event loop in backend/asgi.py) never block on the model itself
+inference_executor = PriorityInferenceExecutor(INFERENCE_WORKERS)
+admission = AdmissionController(
+	INFERENCE_WORKERS, ADMISSION_MAX_WAIT, ADMISSION_MAX_WAIT_BULK, REQUEST_TIMEOUT, REQUEST_TIMEOUT_BULK
+)
+
+# --- Request Profiling ---
+class RequestProfile:
+	"""Per-request stage timings and sizes; stages may be added from inference threads"""
+
+	def __init__(self, endpoint, sampled):
+		self.endpoint = endpoint
+		self.sampled = sampled
+		self.started_at = time.time()
+		self.stages = collections.defaultdict(float)
+		self.counters = collections.defaultdict(int)
+		self.batch_sizes = []
+		self.stacks = collections.Counter()  # Collapsed stack -> samples, filled by stack_sampler
+		self._lock = threading.Lock()
+
+	def add(self, stage, seconds):
+		with self._lock:
+			self.stages[stage] += seconds
+
+	def add_batch(self, inputs):
+		"""Record batch size, real tokens and padded tokens of one tokenized batch"""
+		with self._lock:
+			self.batch_sizes.append(int(inputs['input_ids'].shape[0]))
+			self.counters['tokens'] += int(inputs['attention_mask'].sum())
+			self.counters['padded_tokens'] += int(inputs['input_ids'].numel())
+
+	def to_dict(self, duration, status, error=None):
+		with self._lock:
+			stages_ms = {k: round(v * 1000, 2) for k, v in self.stages.items()}
+			result = {
+				'endpoint': self.endpoint,
+				'started_at': self.started_at,
+				'duration_ms': round(duration * 1000, 2),
+				'status': status,
+				'stages_ms': stages_ms,
+				'batch_sizes': list(self.batch_sizes),
+				**self.counters
+			}
+			if error:
+				result['error'] = error
+			if self.sampled:
+				result['stack_samples'] = sum(self.stacks.values())
+				result['stacks'] = [{'stack': k, 'samples': v} for k, v in self.stacks.most_common(50)]
+		return result
+
+	def summary(self):
+		with self._lock:
+			return ', '.join(f'{k} {v * 1000:.1f}ms' for k, v in self.stages.items())
+
+class StackSampler:
+	"""One background thread sampling the stacks of threads serving profiled requests"""
+
+	def __init__(self, interval):
+		self.interval = interval
+		self._tracked = {}  # thread id -> [profile, nesting depth]
+		self._lock = threading.Lock()
+		self._thread = None
+
+	def _run(self):
+		while True:
+			time.sleep(self.interval)
+			with self._lock:
+				tracked = {tid: entry[0] for tid, entry in self._tracked.items()}
+			if not tracked:
+				continue
+			frames = sys._current_frames()
+			for tid, profile in tracked.items():
+				frame = frames.get(tid)
+				stack = []
+				while frame is not None and len(stack) < 64:
+					code = frame.f_code
+					stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+					frame = frame.f_back
+				if stack:
+					with profile._lock:
+						profile.stacks[';'.join(reversed(stack))] += 1
+
+	def start(self, profile):
+		"""Sample the calling thread into `profile` until stop()"""
+		if profile is None or not profile.sampled:
+			return
+		with self._lock:
+			if self._thread is None:
+				self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+				self._thread.start()
+			entry = self._tracked.setdefault(threading.get_ident(), [profile, 0])
+			entry[1] += 1
+
+	def stop(self, profile):
+		if profile is None or not profile.sampled:
+			return
+		with self._lock:
+			entry = self._tracked.get(threading.get_ident())
+			if entry:
+				entry[1] -= 1
+				if entry[1] == 0:
+					del self._tracked[threading.get_ident()]
+
+stack_sampler = StackSampler(PROFILE_INTERVAL)
+captured_profiles = collections.deque(maxlen=PROFILE_BUFFER_SIZE)  # Slow and sampled requests, newest last
+
+def current_profile():
+	return g.get('profile') if has_request_context() else None
+
+class ProfiledJSONProvider(DefaultJSONProvider):
+	"""Default JSON provider that attributes serialization time to the request profile"""
+
+	def dumps(self, obj, **kwargs):
+		start_time = time.perf_counter()
+		try:
+			return super().dumps(obj, **kwargs)
+		finally:
+			profile = current_profile()
+			if profile is not None:
+				profile.add('serialization', time.perf_counter() - start_time)
+
 # --- Flask App Configuration ---
 app = Flask(__name__, static_folder='../frontend')
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+app.json = ProfiledJSONProvider(app)
 
 # --- Cache Configuration ---
 cache_enabled = os.getenv('CACHE_ENABLED', 'True').lower() == 'true'
@@ -81,11 +428,58 @@ CORS(app, resources={
 	r"/api/*": {
 		"origins": allowed_origins,
 		"methods": ["GET", "POST", "OPTIONS"],
-		"allow_headers": ["Content-Type"]
+		"allow_headers": ["Content-Type"],
+		"expose_headers": ["Retry-After", "X-Dedup-Ratio", "X-Unique-Texts", "ETag"]
 	}
 })
 logger.info(f"CORS enabled for origins: {allowed_origins}")
 
+# --- Response Compression ---
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/csv', 'text/html', 'text/css', 'text/plain', 'application/javascript', 'text/javascript'}
+
+def _gzip_stream(chunks):
+	"""Compress a streamed body chunk by chunk; sync flushes let clients decode each chunk as it arrives"""
+	compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+	try:
+		for chunk in chunks:
+			if isinstance(chunk, str):
+				chunk = chunk.encode('utf-8')
+			data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+			if data:
+				yield data
+		yield compressor.flush()
+	finally:
+		if hasattr(chunks, 'close'):
+			chunks.close()
+
+@app.after_request
+def compress_response(response):
+	"""gzip-encode text responses for clients that send Accept-Encoding: gzip"""
+	if (response.mimetype not in COMPRESSIBLE_MIMETYPES or response.status_code != 200
+			or response.direct_passthrough or 'Content-Encoding' in response.headers):
+		return response
+	response.vary.add('Accept-Encoding')
+	if not request.accept_encodings['gzip']:
+		return response
+	if response.is_streamed:
+		response.response = _gzip_stream(response.response)
+		response.headers.pop('Content-Length', None)
+	else:
+		body = response.get_data()
+		if len(body) < GZIP_MIN_SIZE:
+			return response
+		start_time = time.perf_counter()
+		response.set_data(gzip.compress(body, GZIP_LEVEL, mtime=0))
+		profile = current_profile()
+		if profile is not None:
+			profile.add('compression', time.perf_counter() - start_time)
+	response.headers['Content-Encoding'] = 'gzip'
+	# The gzip representation is a different byte sequence, so it needs its own strong ETag
+	etag, weak = response.get_etag()
+	if etag:
+		response.set_etag(f'{etag}-gzip', weak)
+	return response
+
 # --- Rate Limiting Configuration ---
 rate_limit_enabled = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
 if rate_limit_enabled:
@@ -93,14 +487,177 @@ if rate_limit_enabled:
 		app=app,
 		key_func=get_remote_address,
 		default_limits=[f"{os.getenv('RATE_LIMIT_PER_MINUTE', 60)}/minute"],
-		storage_uri="memory://"
+		# Use a shared store (e.g. redis://) so limits hold across Gunicorn workers
+		storage_uri=os.getenv('RATE_LIMIT_STORAGE_URI', 'memory://')
 	)
-	logger.info("Rate limiting enabled")
+	logger.info(f"Rate limiting enabled ({os.getenv('RATE_LIMIT_STORAGE_URI', 'memory://').split('://')[0]} storage)")
 else:
 	limiter = None
 	logger.info("Rate limiting disabled")
 
+# --- Prediction History Store ---
+history_enabled = os.getenv('HISTORY_ENABLED', 'True').lower() == 'true'
+HISTORY_DB_PATH = os.getenv('HISTORY_DB_PATH', os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/prediction_history.db')))
+
+class PredictionHistoryStore:
+	"""SQLite (WAL) record of every prediction, written in batches off the request path
+
+	`predictions` is the append-only log behind /api/history. `prediction_results`
+	holds one row per (text_hash, model_version) and is the durable cache tier.
+	"""
+
+	SCHEMA = (
+		"""CREATE TABLE IF NOT EXISTS predictions (
+			id INTEGER PRIMARY KEY,
+			text_hash TEXT NOT NULL,
+			model_version TEXT NOT NULL,
+			label INTEGER NOT NULL,
+			probability REAL NOT NULL,
+			confidence REAL NOT NULL,
+			source TEXT NOT NULL,
+			created_at REAL NOT NULL
+		)""",
+		'CREATE INDEX IF NOT EXISTS idx_predictions_created ON predictions (created_at)',
+		'CREATE INDEX IF NOT EXISTS idx_predictions_label ON predictions (label, created_at)',
+		'CREATE INDEX IF NOT EXISTS idx_predictions_confidence ON predictions (confidence, created_at)',
+		"""CREATE TABLE IF NOT EXISTS prediction_results (
+			text_hash TEXT NOT NULL,
+			model_version TEXT NOT NULL,
+			label INTEGER NOT NULL,
+			probability REAL NOT NULL,
+			PRIMARY KEY (text_hash, model_version)
+		) WITHOUT ROWID"""
+	)
+
+	def __init__(self, path, batch_size=500, flush_interval=0.5, max_pending=100000):
+		db_dir = os.path.dirname(path)
+		if db_dir and not os.path.exists(db_dir):
+			os.makedirs(db_dir, exist_ok=True)
+		self.path = path
+		self._batch_size = batch_size
+		self._flush_interval = flush_interval
+		self._pending = queue.Queue(maxsize=max_pending)
+		self._local = threading.local()
+		conn = self._connect()
+		conn.execute('PRAGMA journal_mode=WAL')
+		backfill = conn.execute(
+			"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'prediction_results'"
+		).fetchone() is None
+		for statement in self.SCHEMA:
+			conn.execute(statement)
+		if backfill:  # Databases from before the results table: seed it from the log
+			conn.execute(
+				'INSERT OR REPLACE INTO prediction_results (text_hash, model_version, label, probability) '
+				'SELECT text_hash, model_version, label, probability FROM predictions ORDER BY id'
+			)
+		conn.commit()
+		threading.Thread(target=self._writer, name='history-writer', daemon=True).start()
+
+	def _connect(self):
+		"""One connection per thread; WAL lets readers run alongside the writer"""
+		conn = getattr(self._local, 'conn', None)
+		if conn is None:
+			conn = sqlite3.connect(self.path, timeout=5)
+			conn.execute('PRAGMA synchronous=NORMAL')
+			self._local.conn = conn
+		return conn
+
+	def record(self, text_hashes, labels, probabilities, source):
+		"""Queue rows for the background writer; never blocks the caller"""
+		now = time.time()
+		for text_hash, label, prob in zip(text_hashes, labels, probabilities):
+			prob = float(prob)
+			row = (text_hash, MODEL_VERSION, int(label), prob, max(prob, 1 - prob), source, now)
+			try:
+				self._pending.put_nowait(row)
+			except queue.Full:
+				logger.warning("History write queue full, dropping prediction record")
+				return
+
+	def _writer(self):
+		conn = self._connect()
+		while True:
+			rows = [self._pending.get()]
+			deadline = time.monotonic() + self._flush_interval
+			while len(rows) < self._batch_size:
+				try:
+					rows.append(self._pending.get(timeout=max(deadline - time.monotonic(), 0)))
+				except queue.Empty:
+					break
+			results = {row[:2]: row[:4] for row in rows}  # Latest result per (hash, version)
+			try:
+				with conn:
+					conn.executemany(
+						'INSERT INTO predictions (text_hash, model_version, label, probability, confidence, source, created_at) '
+						'VALUES (?, ?, ?, ?, ?, ?, ?)', rows
+					)
+					conn.executemany(
+						'INSERT OR REPLACE INTO prediction_results (text_hash, model_version, label, probability) '
+						'VALUES (?, ?, ?, ?)', results.values()
+					)
+			except sqlite3.Error as e:
+				logger.error(f"Failed to write {len(rows)} history records: {str(e)}")
+			finally:
+				for _ in rows:
+					self._pending.task_done()
+
+	def flush(self):
+		"""Block until every queued record has been written"""
+		self._pending.join()
+
+	def lookup(self, text_hashes):
+		"""Stored (label, probability) per hash for the current model version"""
+		found = {}
+		text_hashes = list(text_hashes)
+		conn = self._connect()
+		for i in range(0, len(text_hashes), 500):  # Stay under SQLite's variable limit
+			batch = text_hashes[i:i+500]
+			placeholders = ','.join('?' * len(batch))
+			for text_hash, label, prob in conn.execute(
+				f'SELECT text_hash, label, probability FROM prediction_results '
+				f'WHERE model_version = ? AND text_hash IN ({placeholders})',
+				[MODEL_VERSION] + batch
+			):
+				found[text_hash] = (label, prob)
+		return found
+
+	def query(self, start=None, end=None, label=None, min_confidence=None, max_confidence=None, cursor=None, limit=50):
+		"""Newest-first page of predictions; `cursor` is the last id of the previous page"""
+		clauses, params = [], []
+		for clause, value in (
+			('created_at >= ?', start), ('created_at < ?', end), ('label = ?', label),
+			('confidence >= ?', min_confidence), ('confidence <= ?', max_confidence), ('id < ?', cursor)
+		):
+			if value is not None:
+				clauses.append(clause)
+				params.append(value)
+		where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+		rows = self._connect().execute(
+			'SELECT id, text_hash, model_version, label, probability, confidence, source, created_at '
+			f'FROM predictions {where} ORDER BY id DESC LIMIT ?', params + [limit]
+		).fetchall()
+		columns = ('id', 'text_hash', 'model_version', 'label', 'probability', 'confidence', 'source', 'created_at')
+		return [dict(zip(columns, row)) for row in rows]
+
+if history_enabled:
+	history_store = PredictionHistoryStore(HISTORY_DB_PATH)
+	logger.info(f"Prediction history enabled: {HISTORY_DB_PATH}")
+else:
+	history_store = None
+	logger.info("Prediction history disabled")
+
 # --- Helper Functions ---
+class InferenceCancelled(Exception):
+	"""Raised when the ASGI server cancelled the request (deadline or client disconnect)"""
+
+def raise_if_cancelled():
+	"""Stop work for a request the ASGI server has already given up on"""
+	if not has_request_context():
+		return
+	cancelled = request.environ.get('sentiment.cancelled')
+	if cancelled is not None and cancelled.is_set():
+		raise InferenceCancelled('Request cancelled by server')
+
 def allowed_file(filename):
 	"""Check if file extension is allowed"""
 	return '.' in filename and \
@@ -111,48 +668,578 @@ def validate_text_input(text):
 	if not isinstance(text, str):
 		return ""
 	# Limit text length to prevent abuse
-	max_length = 10000  # characters
-	return text[:max_length].strip()
+	return text[:MAX_TEXT_CHARS].strip()
+
+class UploadFormatError(ValueError):
+	"""Raised for uploads that cannot be read as a batch of reviews"""
+
+def upload_format(filename):
+	"""Map an upload's extension to csv, parquet or arrow (Arrow IPC file/stream, Feather v2)"""
+	ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+	return {'parquet': 'parquet', 'arrow': 'arrow', 'feather': 'arrow'}.get(ext, 'csv')
+
+def _rebatch(batches, chunk_size):
+	"""Regroup record batches of any size into tables of exactly chunk_size rows"""
+	pending, rows = [], 0
+	for batch in batches:
+		pending.append(batch)
+		rows += batch.num_rows
+		while rows >= chunk_size:
+			table = pa.Table.from_batches(pending)
+			yield table.slice(0, chunk_size)
+			rest = table.slice(chunk_size)
+			pending, rows = rest.to_batches(), rest.num_rows
+	if rows:
+		yield pa.Table.from_batches(pending)
+
+def _arrow_chunk(table):
+	"""Turn an Arrow table into (texts, labels), cleaning text with Arrow kernels"""
+	if 'text' not in table.schema.names:
+		raise UploadFormatError('File must contain a "text" column')
+	text = pc.cast(table.column('text'), pa.string()).fill_null('')
+	# Same rules as validate_text_input, vectorized
+	text = pc.utf8_trim_whitespace(pc.utf8_slice_codeunits(text, 0, MAX_TEXT_CHARS))
+	labels = table.column('label').to_pylist() if 'label' in table.schema.names else None
+	return text.to_pylist(), labels
+
+def iter_upload_chunks(file, chunk_size=500):
+	"""Yield (texts, labels) chunks from a CSV, Parquet or Arrow IPC upload
+
+	Columnar formats are read record batch by record batch from the upload
+	stream (spooled to a temp file by Werkzeug for large uploads).
+	"""
+	kind = upload_format(file.filename)
+	if kind == 'csv':
+		for chunk in pd.read_csv(file, chunksize=chunk_size):
+			if 'text' not in chunk.columns:
+				raise UploadFormatError('CSV must contain a "text" column')
+			texts = chunk['text'].astype(str).str.slice(0, MAX_TEXT_CHARS).str.strip().tolist()
+			labels = chunk['label'].tolist() if 'label' in chunk.columns else None
+			yield texts, labels
+		return
+
+	if pa is None:
+		raise UploadFormatError('Parquet and Arrow uploads require pyarrow to be installed')
+	stream = file.stream
+	try:
+		if kind == 'parquet':
+			parquet_file = pq.ParquetFile(stream)
+			columns = [c for c in ('text', 'label') if c in parquet_file.schema_arrow.names]
+			batches = parquet_file.iter_batches(batch_size=chunk_size, columns=columns or None)
+		else:
+			try:
+				reader = pa.ipc.open_file(stream)
+				batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+			except pa.ArrowInvalid:
+				# Not the random-access file format, try the streaming format
+				stream.seek(0)
+				batches = pa.ipc.open_stream(stream)
+		# Writers choose their own batch sizes; keep model batches uniform
+		for table in _rebatch(batches, chunk_size):
+			yield _arrow_chunk(table)
+	except pa.ArrowInvalid as e:
+		raise UploadFormatError(f'Invalid {kind.capitalize()} file: {str(e)}')
+
+def columnar_response(table, output_format):
+	"""Serialize an Arrow table as a Parquet or Arrow IPC file download"""
+	sink = pa.BufferOutputStream()
+	if output_format == 'parquet':
+		pq.write_table(table, sink)
+		mimetype, filename = 'application/vnd.apache.parquet', 'predictions.parquet'
+	else:
+		with pa.ipc.new_file(sink, table.schema) as writer:
+			writer.write_table(table)
+		mimetype, filename = 'application/vnd.apache.arrow.file', 'predictions.arrow'
+	return sink.getvalue().to_pybytes(), mimetype, filename
 
 def log_request(endpoint, status='success', error=None):
-	"""Log API requests"""
+	"""Log API requests; keep stage breakdowns of slow and sampled ones"""
 	def decorator(func):
 		@wraps(func)
 		def wrapper(*args, **kwargs):
-			start_time = time.time()
+			start_time = time.perf_counter()
 			client_ip = request.remote_addr
+			profile = RequestProfile(endpoint, random.random() < PROFILE_SAMPLE_RATE)
+			profile.counters['input_bytes'] = request.content_length or 0
+			g.profile = profile
+			stack_sampler.start(profile)
+			status_code, failure = None, None
 			try:
-				result = func(*args, **kwargs)
-				duration = time.time() - start_time
-				logger.info(f"✅ {endpoint} - {client_ip} - {duration:.2f}s")
+				result = app.make_response(func(*args, **kwargs))
+				status_code = result.status_code
 				return result
 			except Exception as e:
-				duration = time.time() - start_time
-				logger.error(f"❌ {endpoint} - {client_ip} - {duration:.2f}s - Error: {str(e)}")
+				failure = str(e)
 				raise
+			finally:
+				stack_sampler.stop(profile)
+				duration = time.perf_counter() - start_time
+				if failure is None:
+					logger.info(f"✅ {endpoint} - {client_ip} - {status_code} - {duration * 1000:.1f}ms")
+				else:
+					logger.error(f"❌ {endpoint} - {client_ip} - {duration * 1000:.1f}ms - Error: {failure}")
+				slow = duration * 1000 >= SLOW_REQUEST_MS
+				if slow:
+					logger.warning(f"🐢 Slow {endpoint} ({duration * 1000:.1f}ms): {profile.summary() or 'no inference'}")
+				if slow or profile.sampled:
+					captured_profiles.append(profile.to_dict(duration, status_code, failure))
+		return wrapper
+	return decorator
+
+def data_path(env_var, default):
+	"""Dataset location from the environment, defaults are relative to backend/"""
+	return os.getenv(env_var, os.path.abspath(os.path.join(os.path.dirname(__file__), default)))
+
+_file_fingerprints = {}  # path -> (size, mtime_ns, content hash)
+
+def file_fingerprint(path):
+	"""Content hash of a data file, recomputed only when its size or mtime changes"""
+	try:
+		stat = os.stat(path)
+	except OSError:
+		return 'missing'
+	cached = _file_fingerprints.get(path)
+	if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+		return cached[2]
+	digest = hashlib.sha256()
+	with open(path, 'rb') as f:
+		for block in iter(lambda: f.read(1024 * 1024), b''):
+			digest.update(block)
+	_file_fingerprints[path] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+	return digest.hexdigest()
+
+def conditional_get(max_age, data_files=lambda: [], weak=False):
+	"""ETag from the model version, query and data files; answers 304 without recomputing
+
+	The tag is also left in `g.etag` so handlers can key their cached bodies on it.
+	Use `weak` for bodies that vary in ways the tag does not capture.
+	"""
+	def decorator(func):
+		@wraps(func)
+		def wrapper(*args, **kwargs):
+			parts = [MODEL_VERSION, request.path, request.query_string.decode('latin1')]
+			parts.extend(file_fingerprint(path) for path in data_files())
+			etag = hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()[:32]
+			cache_control = f'public, max-age={max_age}'
+			# Compressed responses carry an "-gzip" variant of the same tag
+			matched = next((tag for tag in (etag, f'{etag}-gzip') if request.if_none_match.contains_weak(tag)), None)
+			if matched:
+				response = app.response_class(status=304)
+				response.set_etag(matched, weak)
+				response.headers['Cache-Control'] = cache_control
+				response.vary.add('Accept-Encoding')
+				return response
+			g.etag = etag
+			response = app.make_response(func(*args, **kwargs))
+			if response.status_code == 200:
+				response.set_etag(etag, weak)
+				response.headers['Cache-Control'] = cache_control
+			return response
 		return wrapper
 	return decorator
 
+def estimate_upload_tokens(file):
+	"""Tokens a batch upload can queue: CSV rows are capped at MAX_SEQUENCE_LENGTH each"""
+	if upload_format(file.filename) != 'csv':
+		return (request.content_length or 0) // 4
+	tokens = 0
+	for line in file.stream:
+		tokens += min(len(line) // 4 + 2, MAX_SEQUENCE_LENGTH)
+	file.stream.seek(0)
+	return tokens
+
+def is_bulk_request(content_type):
+	"""CSV uploads (multipart forms) take the bulk lane and the bulk deadline"""
+	return bool(content_type and content_type.startswith('multipart/form-data'))
+
+def estimate_tokens(bulk):
+	"""Cheap upper bound on the tokens a request will queue, before any inference"""
+	if bulk:
+		file = request.files.get('file')
+		return estimate_upload_tokens(file) if file and file.filename else 0
+	data = request.get_json(silent=True) or {}
+	if not isinstance(data, dict):
+		return 0
+	texts = data.get('texts') if isinstance(data.get('texts'), list) else [data.get('text', '')]
+	texts = [t for t in texts if isinstance(t, str)]
+	if request.endpoint == 'api_predict_sentences':
+		# Every sentence is its own sequence, so a long review is not truncated to one window
+		texts = [t[start:end] for t in texts for start, end in split_sentences(t)]
+	return sum(min(len(t) // 4 + 2, MAX_SEQUENCE_LENGTH) for t in texts)
+
+def admission_control(func):
+	"""Reject work early with 503 when the inference queue cannot serve it in time"""
+	@wraps(func)
+	def wrapper(*args, **kwargs):
+		bulk = is_bulk_request(request.content_type)
+		lane = LANE_BULK if bulk else LANE_INTERACTIVE
+		tokens = estimate_tokens(bulk)
+		try:
+			admission.admit(lane, tokens)
+		except ServerOverloaded as e:
+			logger.warning(f"Shedding {'bulk' if bulk else 'interactive'} request: {str(e)}")
+			response = jsonify({'error': 'Server overloaded, please retry later', 'retry_after': e.retry_after})
+			response.headers['Retry-After'] = str(e.retry_after)
+			return response, 503
+		g.inference_lane = lane
+		try:
+			return func(*args, **kwargs)
+		finally:
+			admission.release(lane, tokens)
+	return wrapper
+
 # --- Helper functions ---
+def _forward(inputs, profile=None):
+	"""Run one tokenized batch through the model (executes on inference_executor)"""
+	start_time = time.perf_counter()
+	stack_sampler.start(profile)
+	try:
+		with torch.no_grad():
+			outputs = model(**inputs)
+			probs = torch.softmax(outputs.logits, dim=1)
+			preds = torch.argmax(probs, dim=1).cpu().numpy()
+			prob_pos = probs[:, 1].cpu().numpy()
+	finally:
+		stack_sampler.stop(profile)
+	elapsed = time.perf_counter() - start_time
+	admission.observe(inputs['input_ids'].numel(), elapsed)
+	if profile is not None:
+		profile.add('model', elapsed)
+	return preds, prob_pos
+
+def _collect(future, profile):
+	"""Wait for an inference future; covers queueing plus any forward-pass time not overlapped"""
+	start_time = time.perf_counter()
+	result = future.result()
+	if profile is not None:
+		profile.add('inference_wait', time.perf_counter() - start_time)
+	return result
+
 def predict_sentiment(texts):
+	"""Encode each batch while the model runs the previous one"""
 	if isinstance(texts, str):
 		texts = [texts]
 	batch_size = int(os.getenv('BATCH_SIZE', 32))  # Số lượng review xử lý mỗi batch
-	max_length = int(os.getenv('MAX_SEQUENCE_LENGTH', 256))
+	# The Rust encoder releases the GIL, so encoding overlaps the forward pass in flight
+	return _pipelined_forward(encode_texts(texts[i:i+batch_size]) for i in range(0, len(texts), batch_size))
+
+def predict_token_ids(token_ids):
+	"""Pipelined forward passes over texts already run through encode_texts"""
+	batch_size = int(os.getenv('BATCH_SIZE', 32))
+	return _pipelined_forward(token_ids[i:i+batch_size] for i in range(0, len(token_ids), batch_size))
+
+def _pipelined_forward(id_batches):
+	"""Submit each batch of token ids as it is produced, collecting the previous one meanwhile"""
+	# Work outside admission-controlled endpoints (metrics, scripts) yields to interactive requests
+	lane = g.get('inference_lane', LANE_BULK) if has_request_context() else LANE_BULK
+	profile = current_profile()
 	all_preds = []
 	all_probs = []
-	for i in range(0, len(texts), batch_size):
-		batch_texts = texts[i:i+batch_size]
-		inputs = tokenizer(batch_texts, padding=True, truncation=True, max_length=max_length, return_tensors="pt")
-		with torch.no_grad():
-			outputs = model(**inputs)
-			probs = torch.softmax(outputs.logits, dim=1)
-			preds = torch.argmax(probs, dim=1).cpu().numpy()
-			prob_pos = probs[:, 1].cpu().numpy()
+	in_flight = None
+	while True:
+		raise_if_cancelled()
+		# Produce and pack this batch while the model is still busy with the previous one
+		start_time = time.perf_counter()
+		batch_ids = next(id_batches, None)
+		if batch_ids is None:
+			break
+		inputs = pack_batch(batch_ids)
+		if profile is not None:
+			profile.add('tokenizer', time.perf_counter() - start_time)
+			profile.add_batch(inputs)
+		future = inference_executor.submit(_forward, inputs, profile, lane=lane)
+		if in_flight is not None:
+			preds, prob_pos = _collect(in_flight, profile)
+			all_preds.extend(preds)
+			all_probs.extend(prob_pos)
+		in_flight = future
+	if in_flight is not None:
+		preds, prob_pos = _collect(in_flight, profile)
 		all_preds.extend(preds)
 		all_probs.extend(prob_pos)
 	return np.array(all_preds), np.array(all_probs)
 
+def normalize_for_model(texts):
+	"""Map texts to the form the model actually sees, so equivalent inputs share a key"""
+	# The fast tokenizer's normalizer does the lowercasing/accent stripping for uncased models
+	normalizer = getattr(getattr(tokenizer, 'backend_tokenizer', None), 'normalizer', None)
+	if normalizer is not None:
+		texts = [normalizer.normalize_str(t) for t in texts]
+	elif getattr(tokenizer, 'do_lower_case', False):
+		texts = [t.lower() for t in texts]
+	# Tokenization splits on whitespace, so runs of it never change the input ids
+	return pd.Series(texts, dtype=object).str.split().str.join(' ')
+
+def hash_texts(keys):
+	"""Stable identifiers for normalized texts, stored instead of the texts themselves"""
+	return [hashlib.sha256(key.encode('utf-8')).hexdigest() for key in keys]
+
+def predict_single(text, source):
+	"""Predict one review through the cache tiers: memory cache, history store, model"""
+	text_hash = hash_texts(normalize_for_model([text]))[0]
+	cache_key = f'prediction_{MODEL_VERSION}_{text_hash}'
+	result = cache.get(cache_key) if cache_enabled else None
+	if result is None:
+		if history_store:
+			result = history_store.lookup([text_hash]).get(text_hash)
+		if result is None:
+			preds, probs = predict_sentiment(text)
+			result = (int(preds[0]), float(probs[0]))
+		if cache_enabled:
+			cache.set(cache_key, result)
+	if history_store:
+		history_store.record([text_hash], [result[0]], [result[1]], source)
+	return result
+
+def predict_sentiment_deduplicated(texts, scored, source='batch'):
+	"""Predict only texts not already in `scored` and scatter results back to every row
+
+	`scored` maps normalized text -> (label, probability) and is shared across the
+	chunks of one upload, so repeats are collapsed across the whole file. Texts
+	seen in earlier uploads are served from the history store. History gets one
+	entry per distinct text per upload, not one per duplicate row.
+	"""
+	codes, uniques = pd.factorize(normalize_for_model(texts))
+	hashes = hash_texts(uniques)
+	pending = [(key, h) for key, h in zip(uniques, hashes) if key not in scored]
+	first_seen = list(pending)
+	if pending and history_store:
+		stored = history_store.lookup(h for _, h in pending)
+		scored.update((key, stored[h]) for key, h in pending if h in stored)
+		pending = [(key, h) for key, h in pending if h not in stored]
+	if pending:
+		keys = [key for key, _ in pending]
+		preds, probs = predict_sentiment(keys)
+		scored.update(zip(keys, zip(preds.tolist(), probs.tolist())))
+	unique_results = np.array([scored[key] for key in uniques], dtype=float).reshape(-1, 2)
+	preds, probs = unique_results[codes, 0].astype(int), unique_results[codes, 1]
+	if history_store and first_seen:
+		labels, probabilities = zip(*(scored[key] for key, _ in first_seen))
+		history_store.record([h for _, h in first_seen], labels, probabilities, source)
+	return preds, probs
+
+def dedup_ratio(total_rows, unique_rows):
+	"""Fraction of rows that were served without running the model"""
+	return round(1 - unique_rows / total_rows, 4) if total_rows else 0.0
+
+# --- Sentence Breakdown ---
+# Sentence ends: terminal punctuation (optionally closed by a quote/bracket) followed by
+# whitespace and a non-lowercase character (not after common titles), HTML line breaks
+# (IMDB reviews use <br />), newlines
+SENTENCE_BOUNDARY = re.compile(r'(?:(?<=[.!?])|(?<=[.!?]["\')\]]))(?<!\bMr\.)(?<!\bMrs\.)(?<!\bMs\.)(?<!\bDr\.)(?<!\bSt\.)(?<!\bvs\.)\s+(?=[^a-z])|(?:\s*<[bB][rR]\s*/?>)+\s*|\s*\n\s*')
+
+def split_sentences(text):
+	"""(start, end) character spans of the non-empty sentences of a review"""
+	spans, start = [], 0
+	for match in SENTENCE_BOUNDARY.finditer(text):
+		spans.append((start, match.start()))
+		start = match.end()
+	spans.append((start, len(text)))
+	result = []
+	for start, end in spans:
+		segment = text[start:end]
+		stripped = segment.strip()
+		if stripped:
+			start += len(segment) - len(segment.lstrip())
+			result.append((start, start + len(stripped)))
+	return result
+
+def predict_sentences(sentences):
+	"""Score sentences through the prediction cache, then one length-bucketed pass for the rest
+
+	Sentences share cache keys with whole-text predictions, so boilerplate
+	sentences repeated across reviews are scored once per model version.
+	Returns (preds, probs, number of unique sentences, number served from cache).
+	"""
+	codes, uniques = pd.factorize(normalize_for_model(sentences))
+	hashes = hash_texts(uniques)
+	cache_keys = [f'prediction_{MODEL_VERSION}_{h}' for h in hashes]
+	results = {}
+	if cache_enabled and hashes:
+		results.update((h, r) for h, r in zip(hashes, cache.get_many(*cache_keys)) if r is not None)
+	pending = [i for i, h in enumerate(hashes) if h not in results]
+	if pending and history_store:
+		stored = history_store.lookup(hashes[i] for i in pending)
+		results.update((h, stored[h]) for h in (hashes[i] for i in pending) if h in stored)
+		pending = [i for i in pending if hashes[i] not in results]
+	if pending:
+		token_ids = encode_texts([uniques[i] for i in pending])
+		# Similar lengths end up in the same batch, so little compute goes to padding
+		order = sorted(range(len(pending)), key=lambda j: len(token_ids[j]))
+		preds, probs = predict_token_ids([token_ids[j] for j in order])
+		fresh = {pending[j]: (int(p), float(q)) for j, p, q in zip(order, preds, probs)}
+		results.update((hashes[i], r) for i, r in fresh.items())
+		if cache_enabled:
+			cache.set_many({cache_keys[i]: r for i, r in fresh.items()})
+	unique_results = np.array([results[h] for h in hashes], dtype=float).reshape(-1, 2)
+	return unique_results[codes, 0].astype(int), unique_results[codes, 1], len(hashes), len(hashes) - len(pending)
+
+def sentence_breakdown(review, spans, preds, probs):
+	"""Per-sentence results for one non-empty review and a length-weighted aggregate"""
+	sentences = [
+		{'text': review[start:end], 'start': start, 'end': end, 'label': int(label), 'probability': float(prob)}
+		for (start, end), label, prob in zip(spans, preds, probs)
+	]
+	weights = np.array([end - start for start, end in spans], dtype=float)
+	probability = float(np.average(probs, weights=weights))
+	return {
+		'sentences': sentences,
+		'aggregate': {
+			'label': int(probability >= 0.5),
+			'probability': probability,
+			'positive_sentences': int(np.sum(preds == 1)),
+			'negative_sentences': int(np.sum(preds == 0))
+		}
+	}
+
+# --- Similar Reviews Index ---
+SIMILARITY_INDEX_DIR = os.getenv('SIMILARITY_INDEX_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/similarity_index')))
+SIMILARITY_BLOCK_ROWS = 65536  # Rows scored per matrix-vector product
+
+def _embed_forward(inputs, profile=None):
+	"""Mean-pooled last hidden state for one tokenized batch (executes on inference_executor)"""
+	start_time = time.perf_counter()
+	stack_sampler.start(profile)
+	try:
+		with torch.no_grad():
+			outputs = model(**inputs, output_hidden_states=True)
+			hidden = outputs.hidden_states[-1]
+			mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+			pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+	finally:
+		stack_sampler.stop(profile)
+	if profile is not None:
+		profile.add('model', time.perf_counter() - start_time)
+	return pooled.cpu().numpy().astype(np.float32)
+
+def embed_texts(texts):
+	"""Sentence embeddings from the loaded classifier (teacher or distilled student)"""
+	batch_size = int(os.getenv('BATCH_SIZE', 32))
+	lane = g.get('inference_lane', LANE_BULK) if has_request_context() else LANE_BULK
+	profile = current_profile()
+	start_time = time.perf_counter()
+	token_ids = encode_texts(texts)
+	if profile is not None:
+		profile.add('tokenizer', time.perf_counter() - start_time)
+	embeddings = []
+	for i in range(0, len(texts), batch_size):
+		raise_if_cancelled()
+		start_time = time.perf_counter()
+		inputs = pack_batch(token_ids[i:i+batch_size])
+		if profile is not None:
+			profile.add('tokenizer', time.perf_counter() - start_time)
+			profile.add_batch(inputs)
+		embeddings.append(inference_executor.submit(_embed_forward, inputs, profile, lane=lane).result())
+	return np.concatenate(embeddings) if embeddings else np.zeros((0, model.config.hidden_size), dtype=np.float32)
+
+def _l2_normalize(matrix):
+	return matrix / np.maximum(np.linalg.norm(matrix, axis=-1, keepdims=True), 1e-12)
+
+class SimilarityIndex:
+	"""Memory-mapped matrix of normalized review embeddings with blocked top-k search"""
+
+	def __init__(self, index_dir):
+		with open(os.path.join(index_dir, 'meta.json')) as f:
+			self.meta = json.load(f)
+		self.embeddings = np.load(os.path.join(index_dir, 'embeddings.npy'), mmap_mode='r')
+		self.mean = np.load(os.path.join(index_dir, 'mean.npy'))
+		self.projection = np.load(os.path.join(index_dir, 'projection.npy'))
+		reviews = pd.read_csv(os.path.join(index_dir, 'reviews.csv'))
+		self.texts = reviews['text'].astype(str).tolist()
+		self.labels = reviews['label'].to_numpy()
+
+	def encode(self, raw):
+		"""Project raw model embeddings into the index space"""
+		return _l2_normalize((raw - self.mean) @ self.projection).astype(np.float32)
+
+	def search(self, query, k):
+		"""Top-k cosine similarities of one encoded query, scanning the matrix block by block"""
+		best_idx = np.zeros(0, dtype=np.int64)
+		best_scores = np.zeros(0, dtype=np.float32)
+		for start in range(0, len(self.embeddings), SIMILARITY_BLOCK_ROWS):
+			scores = self.embeddings[start:start+SIMILARITY_BLOCK_ROWS] @ query
+			if len(scores) > k:
+				top = np.argpartition(scores, -k)[-k:]
+			else:
+				top = np.arange(len(scores))
+			best_idx = np.concatenate([best_idx, top + start])
+			best_scores = np.concatenate([best_scores, scores[top]])
+			if len(best_scores) > k:
+				keep = np.argpartition(best_scores, -k)[-k:]
+				best_idx, best_scores = best_idx[keep], best_scores[keep]
+		order = np.argsort(-best_scores)
+		return best_idx[order], best_scores[order]
+
+def build_similarity_index(csv_path, index_dir, dim=128, fit_rows=20000, chunk_size=2048, random_state=42):
+	"""Embed a text,label CSV once and write the memory-mapped index to index_dir
+
+	Raw embeddings are optionally reduced to `dim` components (PCA fitted on a
+	random sample of `fit_rows` reviews) so a scan touches far less memory per query.
+	"""
+	reviews = pd.read_csv(csv_path)[['text', 'label']]
+	reviews['text'] = reviews['text'].astype(str)
+	os.makedirs(index_dir, exist_ok=True)
+	hidden_size = model.config.hidden_size
+	raw_path = os.path.join(index_dir, 'raw_embeddings.npy')
+	raw = np.lib.format.open_memmap(raw_path, mode='w+', dtype=np.float32, shape=(len(reviews), hidden_size))
+	texts = reviews['text'].tolist()
+	for start in range(0, len(texts), chunk_size):
+		raw[start:start+chunk_size] = embed_texts(texts[start:start+chunk_size])
+		logger.info(f"Embedded {min(start + chunk_size, len(texts))}/{len(texts)} reviews")
+
+	# Sampled rather than the first rows: CSVs sorted by label would fit one class only
+	rows = np.random.default_rng(random_state).choice(len(raw), size=min(fit_rows, len(raw)), replace=False)
+	sample = np.asarray(raw[np.sort(rows)], dtype=np.float64)
+	mean = sample.mean(axis=0)
+	if dim and dim < hidden_size:
+		# Principal directions of the sample, largest variance first
+		_, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+		projection = vt[:dim].T
+	else:
+		projection = np.eye(hidden_size)
+	np.save(os.path.join(index_dir, 'mean.npy'), mean.astype(np.float32))
+	np.save(os.path.join(index_dir, 'projection.npy'), projection.astype(np.float32))
+
+	embeddings = np.lib.format.open_memmap(
+		os.path.join(index_dir, 'embeddings.npy'), mode='w+', dtype=np.float32, shape=(len(reviews), projection.shape[1])
+	)
+	for start in range(0, len(texts), chunk_size):
+		block = np.asarray(raw[start:start+chunk_size])
+		embeddings[start:start+chunk_size] = _l2_normalize((block - mean) @ projection)
+	embeddings.flush()
+	del raw
+	os.remove(raw_path)
+
+	reviews.to_csv(os.path.join(index_dir, 'reviews.csv'), index=False)
+	with open(os.path.join(index_dir, 'meta.json'), 'w') as f:
+		json.dump({'model_version': MODEL_VERSION, 'source': os.path.abspath(csv_path), 'rows': len(reviews),
+				   'dim': int(projection.shape[1]), 'created_at': time.time()}, f)
+	logger.info(f"Similarity index written to {index_dir}: {len(reviews)} reviews, {projection.shape[1]} dims")
+
+similarity_index = None
+similarity_index_lock = threading.Lock()
+_rejected_index_meta = None  # mtime of a meta.json built with another model, so it is read once
+
+def get_similarity_index():
+	"""Load the index on first use; None if it is missing or built with another model"""
+	global similarity_index, _rejected_index_meta
+	with similarity_index_lock:
+		meta_path = os.path.join(SIMILARITY_INDEX_DIR, 'meta.json')
+		if similarity_index is None and os.path.exists(meta_path):
+			# Check the model version before loading reviews.csv and the matrices
+			stamp = os.stat(meta_path).st_mtime_ns
+			if stamp == _rejected_index_meta:
+				return None
+			with open(meta_path) as f:
+				built_with = json.load(f).get('model_version')
+			if built_with != MODEL_VERSION:
+				logger.warning(f"Similarity index was built with model {built_with}, rebuild it for {MODEL_VERSION}")
+				_rejected_index_meta = stamp
+				return None
+			similarity_index = SimilarityIndex(SIMILARITY_INDEX_DIR)
+			logger.info(f"Loaded similarity index: {len(similarity_index.texts)} reviews")
+		return similarity_index
+
 # --- Health Check Endpoint ---
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -162,14 +1249,16 @@ def health_check():
 		'timestamp': time.time(),
 		'model_loaded': model is not None,
 		'cache_enabled': cache_enabled,
-		'rate_limit_enabled': rate_limit_enabled
+		'rate_limit_enabled': rate_limit_enabled,
+		'admission': admission.snapshot()
 	}), 200
 
 # --- API routes ---
 @app.route('/api/predict', methods=['POST'])
 @log_request('predict')
+@admission_control
 def api_predict():
-	"""Predict sentiment for single review or batch CSV file"""
+	"""Predict sentiment for single review or batch CSV / Parquet / Arrow file"""
 	if limiter:
 		limiter.limit(f"{os.getenv('RATE_LIMIT_PREDICT_PER_MINUTE', 10)}/minute")(lambda: None)()
 	
@@ -191,26 +1280,25 @@ def api_predict():
 			logger.info(f"Processing batch file: {filename}")
 			
 			results = []
+			scored = {}  # Normalized text -> prediction, shared across chunks
 			chunk_size = 500  # Number of rows per chunk, adjust for RAM
 			try:
-				for chunk in pd.read_csv(file, chunksize=chunk_size):
-					if 'text' not in chunk.columns:
-						return jsonify({'error': 'CSV must contain a "text" column'}), 400
-					texts = chunk['text'].astype(str).tolist()
-					# Validate texts
-					texts = [validate_text_input(t) for t in texts]
-					preds, probs = predict_sentiment(texts)
+				for texts, _ in iter_upload_chunks(file, chunk_size):
+					preds, probs = predict_sentiment_deduplicated(texts, scored)
 					results.extend([
 						{'text': t, 'label': int(l), 'probability': float(p)}
 						for t, l, p in zip(texts, preds, probs)
 					])
-				logger.info(f"Batch processing completed: {len(results)} reviews")
-				return jsonify({'results': results})
+				ratio = dedup_ratio(len(results), len(scored))
+				logger.info(f"Batch processing completed: {len(results)} reviews, {len(scored)} unique (dedup ratio {ratio})")
+				return jsonify({'results': results, 'unique_texts': len(scored), 'dedup_ratio': ratio})
 			except pd.errors.EmptyDataError:
 				return jsonify({'error': 'CSV file is empty'}), 400
+			except UploadFormatError as e:
+				return jsonify({'error': str(e)}), 400
 			except Exception as e:
-				logger.error(f"Error processing CSV: {str(e)}")
-				return jsonify({'error': f'Error processing CSV: {str(e)}'}), 500
+				logger.error(f"Error processing {upload_format(filename)} upload: {str(e)}")
+				return jsonify({'error': f'Error processing file: {str(e)}'}), 500
 		else:
 			# Single review
 			data = request.get_json()
@@ -221,14 +1309,15 @@ def api_predict():
 			if not text:
 				return jsonify({'error': 'Text is required'}), 400
 			
-			preds, probs = predict_sentiment(text)
-			return jsonify({'label': int(preds[0]), 'probability': float(probs[0])})
+			label, probability = predict_single(text, 'predict')
+			return jsonify({'label': label, 'probability': probability})
 	except Exception as e:
 		logger.error(f"Unexpected error in predict endpoint: {str(e)}")
 		return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/metrics', methods=['GET'])
 @log_request('metrics')
+@conditional_get(600, lambda: [data_path('VAL_DATA_PATH', '../data/samples/val_small.csv')])
 def api_metrics():
 	"""Get model evaluation metrics with adjustable threshold"""
 	try:
@@ -239,10 +1328,10 @@ def api_metrics():
 		if not 0.0 <= threshold <= 1.0:
 			return jsonify({'error': 'Threshold must be between 0.0 and 1.0'}), 400
 		
-		val_path = os.getenv('VAL_DATA_PATH', os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/samples/val_small.csv')))
+		val_path = data_path('VAL_DATA_PATH', '../data/samples/val_small.csv')
 		
 		# Check cache if enabled
-		cache_key = f'metrics_{threshold}'
+		cache_key = f'metrics_{threshold}_{g.etag}'  # A changed data file gets a new key
 		if cache_enabled:
 			cached_result = cache.get(cache_key)
 			if cached_result:
@@ -294,21 +1383,27 @@ def api_metrics():
 		logger.error(f"Error in metrics endpoint: {str(e)}")
 		return jsonify({'error': 'Internal server error'}), 500
 
+def dataset_paths():
+	return [
+		data_path('TRAIN_DATA_PATH', '../data/samples/train_small.csv'),
+		data_path('VAL_DATA_PATH', '../data/samples/val_small.csv'),
+		data_path('TEST_DATA_PATH', '../data/raw/test.csv')
+	]
+
 @app.route('/api/dataset-info', methods=['GET'])
 @log_request('dataset-info')
+@conditional_get(3600, dataset_paths)
 def api_dataset_info():
 	"""Get dataset statistics and sample data"""
 	try:
 		# Check cache if enabled
 		if cache_enabled:
-			cached_result = cache.get('dataset_info')
+			cached_result = cache.get(f'dataset_info_{g.etag}')
 			if cached_result:
 				logger.info("Returning cached dataset info")
 				return jsonify(cached_result)
 		
-		train_path = os.getenv('TRAIN_DATA_PATH', os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/samples/train_small.csv')))
-		val_path = os.getenv('VAL_DATA_PATH', os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/samples/val_small.csv')))
-		test_path = os.getenv('TEST_DATA_PATH', os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/raw/test.csv')))
+		train_path, val_path, test_path = dataset_paths()
 		
 		try:
 			# Load train data
@@ -368,7 +1463,7 @@ def api_dataset_info():
 		
 		# Cache result
 		if cache_enabled:
-			cache.set('dataset_info', result, timeout=3600)  # Cache for 1 hour
+			cache.set(f'dataset_info_{g.etag}', result, timeout=3600)  # Cache for 1 hour
 		
 		return jsonify(result)
 	except Exception as e:
@@ -388,6 +1483,7 @@ def serve_frontend(path):
 
 @app.route('/api/model-info', methods=['GET'])
 @log_request('model_info')
+@conditional_get(3600, weak=True)  # system.timestamp changes without changing the tag
 def api_model_info():
 	"""Get model metadata and configuration information"""
 	try:
@@ -402,6 +1498,7 @@ def api_model_info():
 		# Get model configuration
 		model_config = {
 			'model_name': MODEL_NAME,
+			'model_version': MODEL_VERSION,
 			'model_type': model.config.model_type if hasattr(model.config, 'model_type') else 'unknown',
 			'num_labels': model.config.num_labels if hasattr(model.config, 'num_labels') else 2,
 			'vocab_size': tokenizer.vocab_size if hasattr(tokenizer, 'vocab_size') else 'unknown',
@@ -430,6 +1527,7 @@ def api_model_info():
 		api_config = {
 			'rate_limit_enabled': rate_limit_enabled,
 			'cache_enabled': cache_enabled,
+			'history_enabled': history_enabled,
 			'max_file_size_mb': MAX_FILE_SIZE // (1024*1024),
 			'allowed_file_extensions': list(ALLOWED_EXTENSIONS)
 		}
@@ -455,6 +1553,7 @@ def api_model_info():
 
 @app.route('/api/predict/confidence', methods=['POST'])
 @log_request('predict_confidence')
+@admission_control
 def api_predict_with_confidence():
 	"""Predict with minimum confidence threshold filtering"""
 	if limiter:
@@ -476,9 +1575,7 @@ def api_predict_with_confidence():
 			return jsonify({'error': 'Minimum confidence must be between 0.0 and 1.0'}), 400
 		
 		# Get prediction
-		preds, probs = predict_sentiment(text)
-		confidence = float(probs[0])
-		label = int(preds[0])
+		label, confidence = predict_single(text, 'confidence')
 		
 		# Check if confidence meets threshold
 		meets_threshold = confidence >= min_confidence
@@ -504,10 +1601,57 @@ def api_predict_with_confidence():
 		logger.error(f"Error in confidence prediction: {str(e)}")
 		return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
 
+@app.route('/api/predict/sentences', methods=['POST'])
+@log_request('predict_sentences')
+@admission_control
+def api_predict_sentences():
+	"""Per-sentence sentiment for one review (`text`) or several (`texts`)"""
+	if limiter:
+		limiter.limit(f"{os.getenv('RATE_LIMIT_PREDICT_PER_MINUTE', 10)}/minute")(lambda: None)()
+	
+	try:
+		data = request.get_json(silent=True)
+		if not isinstance(data, dict):
+			return jsonify({'error': 'Invalid JSON'}), 400
+		
+		single = 'texts' not in data
+		raw_texts = [data.get('text', '')] if single else data['texts']
+		if not isinstance(raw_texts, list) or not raw_texts:
+			return jsonify({'error': 'texts must be a non-empty list'}), 400
+		if len(raw_texts) > SENTENCE_MAX_REVIEWS:
+			return jsonify({'error': f'At most {SENTENCE_MAX_REVIEWS} reviews per request'}), 400
+		
+		reviews = [validate_text_input(t) for t in raw_texts]
+		if single and not reviews[0]:
+			return jsonify({'error': 'Text is required'}), 400
+		empty = [i for i, review in enumerate(reviews) if not review]
+		if empty:
+			return jsonify({'error': f'Text is required for every review (empty at index {empty[0]})'}), 400
+		
+		# All sentences of all reviews go through the model together
+		spans = [split_sentences(review) for review in reviews]
+		sentences = [review[start:end] for review, review_spans in zip(reviews, spans) for start, end in review_spans]
+		preds, probs, unique_count, cached_count = predict_sentences(sentences)
+		
+		results, offset = [], 0
+		for review, review_spans in zip(reviews, spans):
+			end = offset + len(review_spans)
+			results.append(sentence_breakdown(review, review_spans, preds[offset:end], probs[offset:end]))
+			offset = end
+		stats = {'unique_sentences': unique_count, 'cached_sentences': cached_count}
+		logger.info(f"Sentence breakdown: {len(reviews)} reviews, {len(sentences)} sentences, {unique_count} unique, {cached_count} cached")
+		if single:
+			return jsonify({**results[0], **stats})
+		return jsonify({'results': results, **stats})
+	except Exception as e:
+		logger.error(f"Error in sentence breakdown: {str(e)}")
+		return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/predict/batch/export', methods=['POST'])
 @log_request('batch_export')
+@admission_control
 def api_batch_export():
-	"""Export batch predictions as CSV"""
+	"""Export batch predictions as CSV, Parquet or Arrow IPC"""
 	if limiter:
 		limiter.limit(f"{os.getenv('RATE_LIMIT_PREDICT_PER_MINUTE', 10)}/minute")(lambda: None)()
 	
@@ -519,47 +1663,184 @@ def api_batch_export():
 		if not allowed_file(file.filename):
 			return jsonify({'error': f'Invalid file type. Allowed: {", ".join(ALLOWED_EXTENSIONS)}'}), 400
 		
-		# Process CSV
-		results = []
+		output_format = request.args.get('format', request.form.get('format', 'csv')).lower()
+		if output_format not in ('csv', 'parquet', 'arrow'):
+			return jsonify({'error': 'Output format must be csv, parquet or arrow'}), 400
+		if output_format != 'csv' and pa is None:
+			return jsonify({'error': 'Parquet and Arrow output require pyarrow to be installed'}), 400
+		
+		# Collect results column by column
+		all_texts, all_preds, all_probs, all_labels = [], [], [], []
+		scored = {}  # Normalized text -> prediction, shared across chunks
 		chunk_size = 500
 		
-		for chunk in pd.read_csv(file, chunksize=chunk_size):
-			if 'text' not in chunk.columns:
-				return jsonify({'error': 'CSV must contain a "text" column'}), 400
-			
-			texts = chunk['text'].astype(str).tolist()
-			texts = [validate_text_input(t) for t in texts]
-			preds, probs = predict_sentiment(texts)
-			
-			for i, (t, l, p) in enumerate(zip(texts, preds, probs)):
-				results.append({
-					'text': t,
-					'predicted_label': int(l),
-					'sentiment': 'positive' if int(l) == 1 else 'negative',
-					'confidence': float(p),
-					'original_label': chunk.iloc[i].get('label', 'N/A') if 'label' in chunk.columns else 'N/A'
-				})
-		
-		# Convert to DataFrame
-		df_results = pd.DataFrame(results)
+		try:
+			for texts, labels in iter_upload_chunks(file, chunk_size):
+				preds, probs = predict_sentiment_deduplicated(texts, scored, 'export')
+				all_texts.extend(texts)
+				all_preds.append(preds)
+				all_probs.append(probs)
+				all_labels.extend(labels if labels is not None else ['N/A'] * len(texts))
+		except UploadFormatError as e:
+			return jsonify({'error': str(e)}), 400
+		
+		preds = np.concatenate(all_preds) if all_preds else np.array([], dtype=int)
+		probs = np.concatenate(all_probs) if all_probs else np.array([], dtype=float)
+		columns = {
+			'text': all_texts,
+			'predicted_label': preds,
+			'sentiment': np.where(preds == 1, 'positive', 'negative'),
+			'confidence': probs,
+			'original_label': all_labels
+		}
+		headers = {
+			'X-Unique-Texts': str(len(scored)),
+			'X-Dedup-Ratio': str(dedup_ratio(len(all_texts), len(scored)))
+		}
+		
+		from flask import Response
+		if output_format != 'csv':
+			body, mimetype, filename = columnar_response(pa.table(columns), output_format)
+			headers['Content-Disposition'] = f'attachment; filename={filename}'
+			return Response(body, mimetype=mimetype, headers=headers)
 		
 		# Return CSV
 		from io import StringIO
 		output = StringIO()
-		df_results.to_csv(output, index=False)
+		pd.DataFrame(columns).to_csv(output, index=False)
 		output.seek(0)
 		
-		from flask import Response
+		headers['Content-Disposition'] = 'attachment; filename=predictions.csv'
 		return Response(
 			output.getvalue(),
 			mimetype='text/csv',
-			headers={'Content-Disposition': 'attachment; filename=predictions.csv'}
+			headers=headers
 		)
 		
 	except Exception as e:
 		logger.error(f"Error in batch export: {str(e)}")
 		return jsonify({'error': 'Failed to export batch predictions', 'details': str(e)}), 500
 
+@app.route('/api/similar', methods=['POST'])
+@log_request('similar')
+@admission_control
+def api_similar():
+	"""Top-k most similar training reviews for an input text"""
+	if limiter:
+		limiter.limit(f"{os.getenv('RATE_LIMIT_PREDICT_PER_MINUTE', 10)}/minute")(lambda: None)()
+	
+	try:
+		data = request.get_json()
+		if not data:
+			return jsonify({'error': 'Invalid JSON'}), 400
+		
+		text = validate_text_input(data.get('text', ''))
+		k = int(data.get('k', 5))
+		if not text:
+			return jsonify({'error': 'Text is required'}), 400
+		if not 1 <= k <= 50:
+			return jsonify({'error': 'k must be between 1 and 50'}), 400
+		
+		index = get_similarity_index()
+		if index is None:
+			return jsonify({'error': 'Similarity index not available. Run scripts/build_similarity_index.py'}), 503
+		
+		query = index.encode(embed_texts([text]))[0]
+		search_start = time.perf_counter()
+		rows, scores = index.search(query, k)
+		search_ms = (time.perf_counter() - search_start) * 1000
+		
+		return jsonify({
+			'results': [
+				{'text': index.texts[i], 'label': int(index.labels[i]), 'similarity': float(score)}
+				for i, score in zip(rows, scores)
+			],
+			'index_size': len(index.texts),
+			'search_ms': round(search_ms, 3)
+		})
+	except ValueError as e:
+		return jsonify({'error': f'Invalid parameter value: {str(e)}'}), 400
+	except Exception as e:
+		logger.error(f"Error in similar endpoint: {str(e)}")
+		return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/history', methods=['GET'])
+@log_request('history')
+def api_history():
+	"""Paginated prediction history filtered by time range, label and confidence band"""
+	if history_store is None:
+		return jsonify({'error': 'Prediction history is disabled'}), 404
+	
+	try:
+		def optional(name, cast):
+			value = request.args.get(name)
+			return cast(value) if value not in (None, '') else None
+		
+		label = optional('label', int)
+		limit = optional('limit', int) or 50
+		if label is not None and label not in (0, 1):
+			return jsonify({'error': 'Label must be 0 or 1'}), 400
+		if not 1 <= limit <= 500:
+			return jsonify({'error': 'Limit must be between 1 and 500'}), 400
+		
+		items = history_store.query(
+			start=optional('start', float),
+			end=optional('end', float),
+			label=label,
+			min_confidence=optional('min_confidence', float),
+			max_confidence=optional('max_confidence', float),
+			cursor=optional('cursor', int),
+			limit=limit
+		)
+		return jsonify({
+			'items': items,
+			'count': len(items),
+			'next_cursor': items[-1]['id'] if len(items) == limit else None,
+			'model_version': MODEL_VERSION
+		})
+	except ValueError:
+		return jsonify({'error': 'Invalid query parameter'}), 400
+	except Exception as e:
+		logger.error(f"Error in history endpoint: {str(e)}")
+		return jsonify({'error': 'Internal server error'}), 500
+
+# --- Admin Endpoints ---
+def require_admin(func):
+	"""Require ADMIN_TOKEN as X-Admin-Token or Bearer token; hidden when no token is configured"""
+	@wraps(func)
+	def wrapper(*args, **kwargs):
+		if not ADMIN_TOKEN:
+			return jsonify({'error': 'Resource not found'}), 404
+		auth = request.headers.get('Authorization', '')
+		token = auth[7:] if auth.startswith('Bearer ') else request.headers.get('X-Admin-Token', '')
+		if not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+			logger.warning(f"Rejected admin request from {request.remote_addr}")
+			return jsonify({'error': 'Unauthorized'}), 401
+		return func(*args, **kwargs)
+	return wrapper
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@require_admin
+def api_admin_profiles():
+	"""Captured slow and sampled request profiles, newest first"""
+	try:
+		limit = int(request.args.get('limit', 50))
+	except ValueError:
+		return jsonify({'error': 'limit must be an integer'}), 400
+	if limit < 1:
+		return jsonify({'error': 'limit must be positive'}), 400
+	endpoint = request.args.get('endpoint')
+	profiles = [p for p in reversed(captured_profiles.copy()) if not endpoint or p['endpoint'] == endpoint]
+	response = jsonify({
+		'profiles': profiles[:limit],
+		'captured': len(captured_profiles),
+		'buffer_size': PROFILE_BUFFER_SIZE,
+		'sample_rate': PROFILE_SAMPLE_RATE,
+		'slow_request_ms': SLOW_REQUEST_MS
+	})
+	response.headers['Cache-Control'] = 'no-store'
+	return response
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
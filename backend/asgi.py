@@ -0,0 +1,208 @@
+"""
+ASGI entry point for the Movie Review Sentiment Analysis API.
+
+Serves exactly the routes and response schemas of backend/app.py, but the
+event loop owns the sockets: request bodies (including slow CSV uploads) are
+read asynchronously, Flask handlers run on a bounded thread pool and forward
+passes on the dedicated inference executor. Every request gets a deadline
+(a longer one for CSV uploads) and is cancelled as soon as the client
+disconnects.
+
+Run with:
+	gunicorn -c backend/gunicorn_conf.py backend.asgi:application
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.app import app, logger, is_bulk_request, MAX_FILE_SIZE, REQUEST_TIMEOUT, REQUEST_TIMEOUT_BULK
+
+# --- Configuration ---
+REQUEST_THREADS = int(os.getenv('REQUEST_THREADS', 16))  # Flask handlers running at once
+SPOOL_MAX_MEMORY = 1024 * 1024  # Request bodies above 1MB are spooled to disk
+
+request_executor = ThreadPoolExecutor(max_workers=REQUEST_THREADS, thread_name_prefix='request')
+
+_END = object()
+
+
+async def _send_json(send, status, payload):
+	"""Send a complete JSON response directly from the event loop"""
+	body = json.dumps(payload).encode('utf-8')
+	headers = [
+		(b'content-type', b'application/json'),
+		(b'content-length', str(len(body)).encode('latin1')),
+	]
+	await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+	await send({'type': 'http.response.body', 'body': body})
+
+
+def _request_deadline(scope):
+	"""Seconds this request may take; clients can only shorten the default"""
+	headers = dict(scope['headers'])
+	content_type = headers.get(b'content-type', b'').decode('latin1')
+	timeout = REQUEST_TIMEOUT_BULK if is_bulk_request(content_type) else REQUEST_TIMEOUT
+	try:
+		requested = float(headers.get(b'x-request-timeout', b'').decode('latin1'))
+	except ValueError:
+		return timeout
+	return min(requested, timeout) if requested > 0 else timeout
+
+
+def _build_environ(scope, body, size, cancelled):
+	"""Translate an ASGI HTTP scope into a WSGI environ for the Flask app"""
+	server = scope.get('server') or ('localhost', 80)
+	client = scope.get('client') or ('', 0)
+	environ = {
+		'REQUEST_METHOD': scope['method'],
+		'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin1'),
+		'PATH_INFO': scope['path'].encode('utf-8').decode('latin1'),
+		'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+		'SERVER_NAME': server[0],
+		'SERVER_PORT': str(server[1]),
+		'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+		'REMOTE_ADDR': client[0],
+		'REMOTE_PORT': str(client[1]),
+		'wsgi.version': (1, 0),
+		'wsgi.url_scheme': scope.get('scheme', 'http'),
+		'wsgi.input': body,
+		'wsgi.errors': sys.stderr,
+		'wsgi.multithread': True,
+		'wsgi.multiprocess': True,
+		'wsgi.run_once': False,
+		# The body is fully spooled, so chunked uploads get a length and a terminated stream
+		'wsgi.input_terminated': True,
+		'sentiment.cancelled': cancelled,
+	}
+	for raw_name, raw_value in scope['headers']:
+		name = raw_name.decode('latin1').upper().replace('-', '_')
+		value = raw_value.decode('latin1')
+		if name == 'CONTENT_TYPE':
+			environ[name] = value
+			continue
+		if name == 'CONTENT_LENGTH':
+			continue
+		key = f'HTTP_{name}'
+		environ[key] = f'{environ[key]},{value}' if key in environ else value
+	environ['CONTENT_LENGTH'] = str(size)
+	return environ
+
+
+def _start_wsgi(environ):
+	"""Call the Flask app; returns status, headers and the body iterator"""
+	started = {}
+
+	def start_response(status, headers, exc_info=None):
+		started['status'] = int(status.split(' ', 1)[0])
+		started['headers'] = [(k.lower().encode('latin1'), v.encode('latin1')) for k, v in headers]
+		return lambda data: None
+
+	iterable = app(environ, start_response)
+	return started['status'], started['headers'], iterable
+
+
+async def _read_body(receive, spool):
+	"""Stream the request body into a spooled file; returns False if the client left"""
+	size = 0
+	while True:
+		message = await receive()
+		if message['type'] == 'http.disconnect':
+			return False, size
+		chunk = message.get('body', b'')
+		size += len(chunk)
+		if size <= MAX_FILE_SIZE:
+			spool.write(chunk)
+		if not message.get('more_body', False):
+			return True, size
+
+
+async def _wait_for_disconnect(receive):
+	while True:
+		message = await receive()
+		if message['type'] == 'http.disconnect':
+			return
+
+
+async def _lifespan(receive, send):
+	while True:
+		message = await receive()
+		if message['type'] == 'lifespan.startup':
+			await send({'type': 'lifespan.startup.complete'})
+		elif message['type'] == 'lifespan.shutdown':
+			request_executor.shutdown(wait=False)
+			await send({'type': 'lifespan.shutdown.complete'})
+			return
+
+
+async def application(scope, receive, send):
+	"""ASGI callable bridging to the Flask app"""
+	if scope['type'] == 'lifespan':
+		await _lifespan(receive, send)
+		return
+	if scope['type'] != 'http':
+		return
+
+	loop = asyncio.get_running_loop()
+	deadline = loop.time() + _request_deadline(scope)
+	spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+	try:
+		# Slow uploads only cost the event loop a buffer, never a thread
+		connected, size = await asyncio.wait_for(_read_body(receive, spool), timeout=deadline - loop.time())
+	except asyncio.TimeoutError:
+		spool.close()
+		await _send_json(send, 408, {'error': 'Request body not received in time'})
+		return
+	if not connected:
+		spool.close()
+		return
+	if size > MAX_FILE_SIZE:
+		spool.close()
+		await _send_json(send, 413, {'error': f'File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB'})
+		return
+	spool.seek(0)
+
+	cancelled = threading.Event()
+	environ = _build_environ(scope, spool, size, cancelled)
+	handler = loop.run_in_executor(request_executor, _start_wsgi, environ)
+	# The worker thread may still be reading the body after a timeout
+	handler.add_done_callback(lambda _: spool.close())
+	disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+	try:
+		done, _ = await asyncio.wait(
+			{handler, disconnect},
+			timeout=max(deadline - loop.time(), 0),
+			return_when=asyncio.FIRST_COMPLETED
+		)
+		if handler not in done:
+			# Let the worker thread stop at its next batch boundary
+			cancelled.set()
+			if disconnect in done:
+				logger.info(f"Client disconnected, cancelled {scope['method']} {scope['path']}")
+			else:
+				logger.warning(f"Deadline exceeded for {scope['method']} {scope['path']}")
+				await _send_json(send, 504, {'error': 'Request timed out'})
+			return
+
+		status, headers, iterable = handler.result()
+		await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+		iterator = iter(iterable)
+		try:
+			while True:
+				chunk = await loop.run_in_executor(request_executor, next, iterator, _END)
+				if disconnect.done():
+					cancelled.set()
+					return
+				if chunk is _END:
+					break
+				if chunk:
+					await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+			await send({'type': 'http.response.body', 'body': b''})
+		finally:
+			if hasattr(iterable, 'close'):
+				await loop.run_in_executor(request_executor, iterable.close)
+	finally:
+		disconnect.cancel()
@@ -0,0 +1,42 @@
+"""
+Gunicorn configuration for production serving of backend.asgi:application.
+
+Each worker is a uvicorn event loop holding its own copy of the model, so
+size WORKERS by available RAM and CPU cores rather than expected traffic.
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()  # Same .env as backend/app.py, so WORKERS and the check below agree with the app
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 8000)}"
+workers = int(os.getenv('WORKERS', 2))
+worker_class = 'uvicorn_worker.UvicornWorker'
+
+# Must exceed both request deadlines so the app can answer 504 itself
+timeout = int(max(
+	float(os.getenv('REQUEST_TIMEOUT_SECONDS', 60)),
+	float(os.getenv('REQUEST_TIMEOUT_BULK_SECONDS', 900))
+)) + 30
+graceful_timeout = 30
+keepalive = 5
+
+# Model loading is not fork-safe with torch threads, load after fork
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'INFO').lower()
+
+
+def on_starting(server):
+	"""Warn when each worker would keep its own rate-limit counters"""
+	rate_limited = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+	storage = os.getenv('RATE_LIMIT_STORAGE_URI', 'memory://')
+	if rate_limited and workers > 1 and storage.startswith('memory://'):
+		server.log.warning(
+			f"RATE_LIMIT_STORAGE_URI is {storage} with {workers} workers: each worker counts "
+			f"separately, so clients get up to {workers}x the configured limits. "
+			"Point it at a shared store such as redis://localhost:6379/0"
+		)
@@ -115,8 +115,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 return;
             }
 
-            if (!file.name.endsWith('.csv')) {
-                window.toast.error('Invalid File Type', 'Please upload a CSV file');
+            if (!/\.(csv|parquet|arrow|feather)$/i.test(file.name)) {
+                window.toast.error('Invalid File Type', 'Please upload a CSV, Parquet or Arrow file');
                 return;
             }
 
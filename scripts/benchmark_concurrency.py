@@ -0,0 +1,122 @@
+"""
+Measure how many concurrent connections a running server can hold under a
+mixed workload: slow CSV uploads that trickle their body plus interactive
+single-review predictions issued while those uploads are in flight.
+
+Start the server under test first (with RATE_LIMIT_ENABLED=False so the
+per-IP limiter does not dominate the numbers), then run e.g.:
+	python -m flask --app backend/app.py run --port 8000          # today
+	gunicorn -c backend/gunicorn_conf.py backend.asgi:application  # ASGI
+
+	python scripts/benchmark_concurrency.py --url http://127.0.0.1:8000 --slow 200 --fast 50
+"""
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlparse
+
+BOUNDARY = 'benchmarkboundary'
+
+
+def build_upload(rows):
+	"""Multipart body with a small CSV, sent byte by byte by slow clients"""
+	csv = 'text,label\n' + ''.join(f'"Sample review number {i}, quite good",1\n' for i in range(rows))
+	return (
+		f'--{BOUNDARY}\r\n'
+		'Content-Disposition: form-data; name="file"; filename="reviews.csv"\r\n'
+		'Content-Type: text/csv\r\n\r\n'
+		f'{csv}\r\n--{BOUNDARY}--\r\n'
+	).encode('utf-8')
+
+
+async def read_status(reader):
+	line = await reader.readline()
+	if not line:
+		raise ConnectionError('connection closed')
+	return int(line.split()[1])
+
+
+async def slow_upload(host, port, body, duration):
+	"""Hold one connection open for roughly `duration` seconds while uploading"""
+	reader, writer = await asyncio.open_connection(host, port)
+	try:
+		writer.write((
+			f'POST /api/predict HTTP/1.1\r\nHost: {host}\r\n'
+			f'Content-Type: multipart/form-data; boundary={BOUNDARY}\r\n'
+			f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'
+		).encode('latin1'))
+		pieces = 20
+		step = max(len(body) // pieces, 1)
+		for i in range(0, len(body), step):
+			writer.write(body[i:i + step])
+			await writer.drain()
+			await asyncio.sleep(duration / pieces)
+		return await read_status(reader)
+	finally:
+		writer.close()
+
+
+async def single_predict(host, port):
+	reader, writer = await asyncio.open_connection(host, port)
+	try:
+		payload = json.dumps({'text': 'A wonderful, moving film with great acting.'}).encode('utf-8')
+		start = time.perf_counter()
+		writer.write((
+			f'POST /api/predict HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n'
+			f'Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n'
+		).encode('latin1') + payload)
+		await writer.drain()
+		status = await read_status(reader)
+		return status, time.perf_counter() - start
+	finally:
+		writer.close()
+
+
+def percentile(values, q):
+	if not values:
+		return float('nan')
+	values = sorted(values)
+	return values[min(int(q * len(values)), len(values) - 1)]
+
+
+async def run(args):
+	parsed = urlparse(args.url)
+	host, port = parsed.hostname, parsed.port or 80
+	body = build_upload(args.rows)
+
+	slow_tasks = [asyncio.ensure_future(slow_upload(host, port, body, args.duration)) for _ in range(args.slow)]
+	# Interactive traffic arrives while the uploads are holding their connections
+	await asyncio.sleep(args.duration / 4)
+	fast_results = await asyncio.gather(
+		*[asyncio.wait_for(single_predict(host, port), args.timeout) for _ in range(args.fast)],
+		return_exceptions=True
+	)
+	slow_results = await asyncio.gather(*slow_tasks, return_exceptions=True)
+
+	slow_ok = sum(1 for r in slow_results if r == 200)
+	fast_ok = [r[1] for r in fast_results if not isinstance(r, BaseException) and r[0] == 200]
+	failures = {}
+	for r in slow_results + [r if isinstance(r, BaseException) else r[0] for r in fast_results]:
+		if r != 200:
+			reason = type(r).__name__ if isinstance(r, BaseException) else f'HTTP {r}'
+			failures[reason] = failures.get(reason, 0) + 1
+	print(f'Server: {args.url}')
+	print(f'Slow uploads held:     {slow_ok}/{args.slow}')
+	print(f'Single predictions ok: {len(fast_ok)}/{args.fast}')
+	print(f'Single prediction p50: {percentile(fast_ok, 0.50) * 1000:.1f} ms')
+	print(f'Single prediction p95: {percentile(fast_ok, 0.95) * 1000:.1f} ms')
+	print(f'Concurrent connections held: {slow_ok + len(fast_ok)}/{args.slow + args.fast}')
+	if failures:
+		print('Failures: ' + ', '.join(f'{k} x{v}' for k, v in sorted(failures.items())))
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Mixed-workload connection concurrency benchmark')
+	parser.add_argument('--url', default='http://127.0.0.1:8000')
+	parser.add_argument('--slow', type=int, default=100, help='Concurrent slow CSV uploads')
+	parser.add_argument('--fast', type=int, default=50, help='Single-review requests issued during uploads')
+	parser.add_argument('--rows', type=int, default=20, help='Rows per uploaded CSV')
+	parser.add_argument('--duration', type=float, default=10.0, help='Seconds each upload trickles for')
+	parser.add_argument('--timeout', type=float, default=60.0, help='Per-request client timeout')
+	asyncio.run(run(parser.parse_args()))
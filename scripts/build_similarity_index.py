@@ -0,0 +1,37 @@
+"""
+Build the embedding index behind /api/similar.
+
+Embeds every review of the training corpus once with the model the API
+loads (MODEL_DIR, so a distilled student works too) and stores the result
+as a memory-mapped float32 matrix in SIMILARITY_INDEX_DIR. Rebuild after
+changing the model; the API ignores indexes built by another model version.
+
+Example:
+    python scripts/build_similarity_index.py --data data/raw/train.csv --dim 128
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app import SIMILARITY_INDEX_DIR, build_similarity_index
+
+
+def main():
+    default_data = os.getenv('TRAIN_DATA_PATH', 'data/samples/train_small.csv')
+    parser = argparse.ArgumentParser(description="Build the /api/similar embedding index")
+    parser.add_argument("--data", default=default_data, help="CSV with text and label columns")
+    parser.add_argument("--output", default=SIMILARITY_INDEX_DIR, help="Index directory")
+    parser.add_argument("--dim", type=int, default=128,
+                        help="PCA dimensions kept per review (0 keeps the full hidden size)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    build_similarity_index(args.data, args.output, dim=args.dim)
+    print(f"Index built in {time.perf_counter() - start:.1f}s: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Offline bulk scoring for corpora of any size, without starting the API.
+
+Reuses the model loading and predict_sentiment logic of backend/app.py.
+The main process streams the input (CSV or Parquet) chunk by chunk and
+writes results as they arrive, while worker processes score chunks. Inside
+each worker predict_sentiment tokenizes the next batch while the model runs
+the current one. Progress is checkpointed after every written chunk, so an
+interrupted run resumes where it stopped.
+
+Examples:
+    python scripts/bulk_score.py reviews.csv scored.csv --workers 4
+    python scripts/bulk_score.py reviews.parquet scored_parquet/ --workers 2 --chunk-size 20000
+    python scripts/bulk_score.py reviews.csv scored.csv --resume
+"""
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def init_worker(threads):
+    """Load the API's model once per worker process"""
+    os.environ.setdefault('HISTORY_ENABLED', 'False')
+    os.environ.setdefault('RATE_LIMIT_ENABLED', 'False')
+    sys.path.insert(0, ROOT)
+    import torch
+    torch.set_num_threads(threads)
+    import backend.app  # noqa: F401  (loads tokenizer and model)
+
+
+def score_chunk(texts):
+    """Score one chunk in a worker; duplicates within the chunk are scored once"""
+    from backend.app import MAX_TEXT_CHARS, predict_sentiment_deduplicated
+    # Same cleanup the API applies to uploads
+    texts = pd.Series(texts, dtype=object).str.slice(0, MAX_TEXT_CHARS).str.strip().tolist()
+    return predict_sentiment_deduplicated(texts, {})
+
+
+def is_parquet(path):
+    return path.lower().endswith('.parquet')
+
+
+def read_chunks(path, chunk_size, skip_rows):
+    """Yield DataFrames of at most chunk_size rows, starting after skip_rows"""
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        # Skip whole row groups using the footer metadata, then slice the remainder
+        first, offset = parquet_file.num_row_groups, 0
+        for i in range(parquet_file.num_row_groups):
+            rows = parquet_file.metadata.row_group(i).num_rows
+            if offset + rows > skip_rows:
+                first = i
+                break
+            offset += rows
+        row_groups = list(range(first, parquet_file.num_row_groups))
+        to_drop = skip_rows - offset
+        if not row_groups:
+            return
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=row_groups):
+            frame = batch.to_pandas()
+            if to_drop:
+                dropped = min(to_drop, len(frame))
+                frame, to_drop = frame.iloc[dropped:], to_drop - dropped
+            if len(frame):
+                yield frame
+        return
+    # Reviews may contain quoted newlines, so skip parsed records rather than file lines
+    to_drop = skip_rows
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        if to_drop:
+            dropped = min(to_drop, len(chunk))
+            chunk, to_drop = chunk.iloc[dropped:], to_drop - dropped
+        if len(chunk):
+            yield chunk
+
+
+def input_texts(frame):
+    if 'text' not in frame.columns:
+        raise SystemExit('Input must contain a "text" column')
+    return frame['text'].astype(str).tolist()
+
+
+class ResultWriter:
+    """Append-only CSV file or directory of Parquet parts, safe to resume"""
+
+    def __init__(self, path, checkpoint):
+        self.path = path
+        self.parquet = is_parquet(path) or path.endswith(os.sep)
+        if self.parquet:
+            os.makedirs(path, exist_ok=True)
+            self.parts = checkpoint.get('parts', 0)
+            # Remove parts written after the last checkpoint (or by an earlier run)
+            for name in os.listdir(path):
+                if name.startswith('part-') and int(name[5:11]) >= self.parts:
+                    os.remove(os.path.join(path, name))
+        else:
+            # Drop anything written after the last checkpoint
+            offset = checkpoint.get('output_bytes', 0)
+            mode = 'r+b' if offset and os.path.exists(path) else 'wb'
+            self.file = open(path, mode)
+            self.file.truncate(offset)
+            self.file.seek(offset)
+            self.header = offset == 0
+
+    def write(self, frame):
+        if self.parquet:
+            frame.to_parquet(os.path.join(self.path, f'part-{self.parts:06d}.parquet'), index=False)
+            self.parts += 1
+            return {'parts': self.parts}
+        frame.to_csv(self.file, header=self.header, index=False)
+        self.header = False
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {'output_bytes': self.file.tell()}
+
+    def close(self):
+        if not self.parquet:
+            self.file.close()
+
+
+def save_checkpoint(path, state):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(args):
+    if not args.resume or not os.path.exists(args.checkpoint):
+        return {}
+    with open(args.checkpoint) as f:
+        state = json.load(f)
+    if state.get('input') != os.path.abspath(args.input) or state.get('output') != os.path.abspath(args.output):
+        raise SystemExit(f'Checkpoint {args.checkpoint} belongs to a different input/output')
+    print(f"Resuming after {state['rows_done']} rows")
+    return state
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Bulk sentiment scoring for large CSV/Parquet corpora')
+    parser.add_argument('input', help='CSV or .parquet file with a "text" column')
+    parser.add_argument('output', help='CSV file, or .parquet / directory for Parquet part files')
+    parser.add_argument('--workers', type=int, default=1, help='Scoring processes (each loads the model)')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per chunk sent to a worker')
+    parser.add_argument('--checkpoint', default=None, help='Progress file (default: <output>.checkpoint.json)')
+    parser.add_argument('--resume', action='store_true', help='Continue from the checkpoint')
+    parser.add_argument('--drop-text', action='store_true', help='Do not copy the text column to the output')
+    parser.add_argument('--report-every', type=float, default=10.0, help='Seconds between progress lines')
+    args = parser.parse_args()
+    args.checkpoint = args.checkpoint or f"{args.output.rstrip(os.sep)}.checkpoint.json"
+    return args
+
+
+def main():
+    args = parse_args()
+    state = load_checkpoint(args)
+    rows_done = state.get('rows_done', 0)
+    writer = ResultWriter(args.output, state)
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+
+    # spawn: every worker imports backend.app fresh instead of inheriting torch state
+    context = multiprocessing.get_context('spawn')
+    pool = context.Pool(args.workers, initializer=init_worker, initargs=(threads,))
+    in_flight = collections.deque()
+    start = last_report = time.perf_counter()
+    session_rows = 0
+
+    def drain_one():
+        nonlocal rows_done, session_rows, last_report
+        frame, result = in_flight.popleft()
+        preds, probs = result.get()
+        if args.drop_text:
+            frame = frame.drop(columns=['text'])
+        frame = frame.assign(
+            predicted_label=preds,
+            sentiment=np.where(preds == 1, 'positive', 'negative'),
+            confidence=probs
+        )
+        position = writer.write(frame)
+        rows_done += len(frame)
+        session_rows += len(frame)
+        save_checkpoint(args.checkpoint, dict(
+            input=os.path.abspath(args.input), output=os.path.abspath(args.output),
+            rows_done=rows_done, **position
+        ))
+        now = time.perf_counter()
+        if now - last_report >= args.report_every:
+            print(f'{rows_done} rows scored, {session_rows / (now - start):.1f} rows/s')
+            last_report = now
+
+    try:
+        for frame in read_chunks(args.input, args.chunk_size, rows_done):
+            in_flight.append((frame, pool.apply_async(score_chunk, (input_texts(frame),))))
+            # Bounded read-ahead keeps memory flat for inputs of any size
+            while len(in_flight) >= args.workers * 2:
+                drain_one()
+        while in_flight:
+            drain_one()
+    finally:
+        pool.terminate()
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f'Done: {rows_done} rows total, {session_rows} this run in {elapsed:.1f}s '
+          f'({session_rows / max(elapsed, 1e-9):.1f} rows/s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Distill the fine-tuned sentiment_model/ (teacher) into a smaller student.
+
+1. Teacher logits over the training split are computed once and cached.
+2. A student with fewer layers (and optionally a narrower hidden size) is
+   trained on temperature-softened teacher targets plus the true labels.
+3. Teacher and student are compared on the validation split for accuracy,
+   single-review latency, batch throughput and model size.
+
+The student is saved with its tokenizer, so the API can serve it directly:
+    MODEL_DIR=./sentiment_model_student python backend/app.py
+
+Example:
+    python scripts/distill_model.py --layers 3 --epochs 3
+    python scripts/distill_model.py --layers 2 --dim 384 --output sentiment_model_student_small
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn.functional as F
+from sklearn.metrics import accuracy_score, f1_score
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Knowledge distillation for the sentiment model")
+    parser.add_argument("--teacher", default="sentiment_model", help="Fine-tuned teacher model directory")
+    parser.add_argument("--train", default="data/raw/train.csv", help="Training split CSV (text,label)")
+    parser.add_argument("--val", default="data/samples/val_small.csv", help="Validation CSV for the report")
+    parser.add_argument("--output", default="sentiment_model_student", help="Where to save the student")
+    parser.add_argument("--layers", type=int, default=3, help="Transformer layers in the student")
+    parser.add_argument("--dim", type=int, default=None, help="Student hidden size (default: teacher's)")
+    parser.add_argument("--temperature", type=float, default=2.0)
+    parser.add_argument("--alpha", type=float, default=0.7, help="Weight of the soft-target loss")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--learning-rate", type=float, default=5e-5)
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--logits-cache", default="artifacts/distill/teacher_logits.npy")
+    parser.add_argument("--report", default="artifacts/results/distillation_report.json")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def batches(texts, batch_size):
+    for i in range(0, len(texts), batch_size):
+        yield texts[i:i + batch_size]
+
+
+@torch.no_grad()
+def predict_logits(model, tokenizer, texts, batch_size, max_length):
+    """Logits for `texts`, processed in longest-first order to minimise padding"""
+    order = np.argsort([-len(t) for t in texts], kind="stable")
+    logits = np.zeros((len(texts), model.config.num_labels), dtype=np.float32)
+    for start in range(0, len(texts), batch_size):
+        idx = order[start:start + batch_size]
+        inputs = tokenizer([texts[i] for i in idx], padding=True, truncation=True,
+                           max_length=max_length, return_tensors="pt")
+        logits[idx] = model(**inputs).logits.cpu().numpy()
+    return logits
+
+
+def cached_teacher_logits(teacher, tokenizer, texts, args):
+    """Run the teacher over the training split once; later runs reuse the cache"""
+    meta_path = os.path.splitext(args.logits_cache)[0] + ".json"
+    meta = {"teacher": os.path.abspath(args.teacher), "train": os.path.abspath(args.train),
+            "rows": len(texts), "max_length": args.max_length}
+    if os.path.exists(args.logits_cache) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f) == meta:
+                print(f"Using cached teacher logits: {args.logits_cache}")
+                return np.load(args.logits_cache)
+
+    print(f"Computing teacher logits for {len(texts)} training reviews...")
+    start = time.perf_counter()
+    logits = predict_logits(teacher, tokenizer, texts, args.batch_size * 2, args.max_length)
+    print(f"Teacher logits computed in {time.perf_counter() - start:.1f}s")
+    os.makedirs(os.path.dirname(args.logits_cache) or ".", exist_ok=True)
+    np.save(args.logits_cache, logits)
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    return logits
+
+
+def build_student(teacher, args):
+    """Shallower (and optionally narrower) DistilBERT, initialised from the teacher where shapes allow"""
+    config = AutoConfig.from_pretrained(args.teacher)
+    config.n_layers = args.layers
+    if args.dim and args.dim != config.dim:
+        config.hidden_dim = config.hidden_dim * args.dim // config.dim
+        config.dim = args.dim
+    student = AutoModelForSequenceClassification.from_config(config)
+
+    if config.dim == teacher.config.dim:
+        # Same width: copy embeddings, classifier and evenly spaced teacher layers
+        teacher_state = teacher.state_dict()
+        keep = np.linspace(0, teacher.config.n_layers - 1, args.layers).round().astype(int)
+        student_state = {}
+        for name in student.state_dict():
+            source = name
+            if ".layer." in name:
+                prefix, rest = name.split(".layer.", 1)
+                index, suffix = rest.split(".", 1)
+                source = f"{prefix}.layer.{keep[int(index)]}.{suffix}"
+            student_state[name] = teacher_state[source]
+        student.load_state_dict(student_state)
+        print(f"Student initialised from teacher layers {keep.tolist()}")
+    else:
+        print(f"Student hidden size {config.dim} differs from teacher, using random initialisation")
+    return student
+
+
+def distill(student, tokenizer, texts, labels, teacher_logits, args):
+    optimizer = torch.optim.AdamW(student.parameters(), lr=args.learning_rate)
+    rng = np.random.default_rng(args.seed)
+    temperature = args.temperature
+    student.train()
+    for epoch in range(args.epochs):
+        order = rng.permutation(len(texts))
+        total_loss, steps = 0.0, 0
+        for idx in batches(order, args.batch_size):
+            inputs = tokenizer([texts[i] for i in idx], padding=True, truncation=True,
+                               max_length=args.max_length, return_tensors="pt")
+            logits = student(**inputs).logits
+            soft_targets = F.softmax(torch.from_numpy(teacher_logits[idx]) / temperature, dim=-1)
+            soft_loss = F.kl_div(F.log_softmax(logits / temperature, dim=-1), soft_targets,
+                                 reduction="batchmean") * temperature ** 2
+            hard_loss = F.cross_entropy(logits, torch.from_numpy(labels[idx]))
+            loss = args.alpha * soft_loss + (1 - args.alpha) * hard_loss
+
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item()
+            steps += 1
+            if steps % 100 == 0:
+                print(f"  epoch {epoch + 1} step {steps}: loss {total_loss / steps:.4f}")
+        print(f"Epoch {epoch + 1}/{args.epochs}: loss {total_loss / max(steps, 1):.4f}")
+    student.eval()
+    return student
+
+
+def model_size_mb(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / (1024 * 1024)
+
+
+@torch.no_grad()
+def benchmark(model, tokenizer, texts, labels, path, args):
+    """Accuracy, latency and throughput the way backend/app.py serves the model"""
+    model.eval()
+    probs = F.softmax(torch.from_numpy(
+        predict_logits(model, tokenizer, texts, args.batch_size, args.max_length)), dim=-1).numpy()
+    preds = probs.argmax(axis=1)
+
+    latencies = []
+    for text in texts[:100]:
+        inputs = tokenizer([text], truncation=True, max_length=args.max_length, return_tensors="pt")
+        start = time.perf_counter()
+        model(**inputs)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for batch in batches(texts, args.batch_size):
+        inputs = tokenizer(batch, padding=True, truncation=True, max_length=args.max_length, return_tensors="pt")
+        model(**inputs)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "accuracy": float(accuracy_score(labels, preds)),
+        "f1": float(f1_score(labels, preds)),
+        "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "latency_p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "throughput_reviews_per_s": float(len(texts) / elapsed),
+        "parameters": int(sum(p.numel() for p in model.parameters())),
+        "size_mb": round(model_size_mb(path), 1),
+        "layers": int(model.config.n_layers),
+        "hidden_size": int(model.config.dim),
+    }
+
+
+def main():
+    args = parse_args()
+    torch.manual_seed(args.seed)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.teacher)
+    teacher = AutoModelForSequenceClassification.from_pretrained(args.teacher)
+    teacher.eval()
+
+    train_df = pd.read_csv(args.train)
+    train_texts = train_df["text"].astype(str).tolist()
+    train_labels = train_df["label"].to_numpy(dtype=np.int64)
+    teacher_logits = cached_teacher_logits(teacher, tokenizer, train_texts, args)
+
+    student = build_student(teacher, args)
+    print(f"Training student: {args.layers} layers, hidden size {student.config.dim}")
+    student = distill(student, tokenizer, train_texts, train_labels, teacher_logits, args)
+
+    student.save_pretrained(args.output)
+    tokenizer.save_pretrained(args.output)
+    print(f"Student saved to {args.output}")
+
+    val_df = pd.read_csv(args.val)
+    val_texts = val_df["text"].astype(str).tolist()
+    val_labels = val_df["label"].to_numpy()
+    report = {
+        "teacher": benchmark(teacher, tokenizer, val_texts, val_labels, args.teacher, args),
+        "student": benchmark(student, tokenizer, val_texts, val_labels, args.output, args),
+        "settings": {"temperature": args.temperature, "alpha": args.alpha, "epochs": args.epochs,
+                     "train_rows": len(train_texts), "val": args.val},
+    }
+
+    print(f"\n{'':24}{'teacher':>12}{'student':>12}")
+    for key in ("accuracy", "f1", "latency_p50_ms", "latency_p95_ms", "throughput_reviews_per_s",
+                "parameters", "size_mb"):
+        print(f"{key:24}{report['teacher'][key]:>12.4g}{report['student'][key]:>12.4g}")
+
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""
+Shared test configuration
+"""
+import os
+import shutil
+import tempfile
+
+# Keep test predictions out of data/prediction_history.db; backend.app opens
+# the history store at import time, so this has to run before any test module
+_history_dir = tempfile.mkdtemp(prefix='sentiment-history-')
+os.environ['HISTORY_DB_PATH'] = os.path.join(_history_dir, 'prediction_history.db')
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_history_dir, ignore_errors=True)
@@ -2,20 +2,25 @@
 Unit tests for API endpoints
 """
 import pytest
+import io
 import json
 import sys
+import time
 import os
 
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from backend.app import app
+import backend.app as app_module
+from backend.app import app, admission, history_store, limiter
 
 
 @pytest.fixture
 def client():
     """Create test client"""
     app.config['TESTING'] = True
+    if limiter:
+        limiter.reset()  # Per-IP prediction limits would otherwise carry over between tests
     with app.test_client() as client:
         yield client
 
@@ -60,6 +65,409 @@ class TestPredictAPI:
         assert response.status_code == 200  # Gets empty string as default
 
 
+class TestBatchDeduplication:
+    """Test duplicate collapsing on batch CSV uploads"""
+    
+    def test_duplicates_scored_once(self, client):
+        """Test that whitespace/case variants share one prediction"""
+        csv = 'text,label\n"Great movie!",1\n"great   MOVIE!",1\n"  Great movie! ",1\n"Awful film",0\n'
+        response = client.post('/api/predict',
+                               data={'file': (io.BytesIO(csv.encode('utf-8')), 'reviews.csv')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert len(data['results']) == 4
+        assert data['unique_texts'] == 2
+        assert data['dedup_ratio'] == 0.5
+        probs = [r['probability'] for r in data['results'][:3]]
+        assert probs[0] == probs[1] == probs[2]
+        assert data['results'][1]['text'] == 'great   MOVIE!'
+
+
+class TestColumnarUploads:
+    """Test Parquet and Arrow IPC batch uploads"""
+    
+    def make_table(self):
+        pa = pytest.importorskip('pyarrow')
+        return pa.table({'text': ['Great movie!', 'Awful film', None], 'label': [1, 0, 0]})
+    
+    def test_predict_parquet(self, client):
+        """Test batch prediction from a Parquet upload"""
+        pq = pytest.importorskip('pyarrow.parquet')
+        buffer = io.BytesIO()
+        pq.write_table(self.make_table(), buffer)
+        buffer.seek(0)
+        response = client.post('/api/predict',
+                               data={'file': (buffer, 'reviews.parquet')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert [r['text'] for r in data['results']] == ['Great movie!', 'Awful film', '']
+    
+    def test_export_arrow_to_parquet(self, client):
+        """Test Arrow IPC upload exported as Parquet"""
+        pa = pytest.importorskip('pyarrow')
+        pq = pytest.importorskip('pyarrow.parquet')
+        table = self.make_table()
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        response = client.post('/api/predict/batch/export?format=parquet',
+                               data={'file': (io.BytesIO(sink.getvalue().to_pybytes()), 'reviews.arrow')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200
+        result = pq.read_table(io.BytesIO(response.data))
+        assert result.num_rows == 3
+        assert result.column('original_label').to_pylist() == [1, 0, 0]
+        assert set(result.column_names) >= {'text', 'predicted_label', 'sentiment', 'confidence'}
+
+
+class TestAdmissionControl:
+    """Test load shedding on prediction endpoints"""
+    
+    def test_overloaded_returns_503(self, client):
+        """Test that requests past the wait deadline are rejected early"""
+        original = admission.seconds_per_token
+        admission.seconds_per_token = 10.0
+        admission.admit(app_module.LANE_INTERACTIVE, 100)  # Work queued ahead
+        try:
+            response = client.post('/api/predict',
+                                   json={'text': 'A long and winding review of a great film.'},
+                                   content_type='application/json')
+        finally:
+            admission.release(app_module.LANE_INTERACTIVE, 100)
+            admission.seconds_per_token = original
+        assert response.status_code == 503
+        assert int(response.headers['Retry-After']) >= 1
+        data = json.loads(response.data)
+        assert 'retry_after' in data
+    
+    def test_large_upload_admitted_when_idle(self, client):
+        """Test that an upload far beyond the wait budget is admitted on an idle server"""
+        original = admission.seconds_per_token
+        admission.seconds_per_token = 10.0
+        csv = 'text,label\n' + '"Same review, repeated many times over.",1\n' * 20000
+        try:
+            response = client.post('/api/predict',
+                                   data={'file': (io.BytesIO(csv.encode('utf-8')), 'reviews.csv')},
+                                   content_type='multipart/form-data')
+        finally:
+            admission.seconds_per_token = original
+        assert response.status_code == 200
+        assert len(json.loads(response.data)['results']) == 20000
+    
+    def test_upload_estimate_capped_per_row(self, client):
+        """Test that long CSV rows count at most MAX_SEQUENCE_LENGTH tokens"""
+        from werkzeug.datastructures import FileStorage
+        csv = 'text\n' + ('x' * 100000 + '\n') * 3
+        file = FileStorage(io.BytesIO(csv.encode('utf-8')), filename='long.csv')
+        with app.test_request_context():
+            tokens = app_module.estimate_upload_tokens(file)
+        assert tokens <= 4 * app_module.MAX_SEQUENCE_LENGTH
+        assert file.stream.read(5) == b'text\n'
+    
+    def test_bulk_admission_respects_deadline(self):
+        """Test that queued uploads are only admitted if they can finish in time"""
+        controller = app_module.AdmissionController(1, 10, 45, 60, 600, seconds_per_token=1.0)
+        controller.admit(app_module.LANE_BULK, 5000)  # Idle: admitted whatever its size
+        controller.release(app_module.LANE_BULK, 5000)
+        controller.admit(app_module.LANE_BULK, 5)
+        controller.admit(app_module.LANE_BULK, 100)  # 5s queued + 100s fits in 600s
+        with pytest.raises(app_module.ServerOverloaded):
+            controller.admit(app_module.LANE_BULK, 1000)  # 105s queued + 1000s does not
+    
+    def test_queue_released_after_request(self, client):
+        """Test that admitted tokens are released once the request finishes"""
+        client.post('/api/predict',
+                    json={'text': 'Great movie!'},
+                    content_type='application/json')
+        snapshot = admission.snapshot()
+        assert snapshot['queued_tokens_interactive'] == 0
+        assert snapshot['queued_tokens_bulk'] == 0
+
+
+class TestHistoryAPI:
+    """Test /api/history endpoint"""
+    
+    def test_history_records_predictions(self, client):
+        """Test that predictions are stored and can be filtered"""
+        start = time.time()
+        response = client.post('/api/predict',
+                               json={'text': 'An unforgettable film about memory.'},
+                               content_type='application/json')
+        label = json.loads(response.data)['label']
+        history_store.flush()
+        
+        response = client.get(f'/api/history?start={start}&label={label}')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['count'] >= 1
+        item = data['items'][0]
+        assert item['label'] == label
+        assert item['model_version'] == data['model_version']
+        assert 0.5 <= item['confidence'] <= 1
+        assert 'text' not in item
+    
+    def test_history_pagination(self, client):
+        """Test cursor pagination returns disjoint pages"""
+        for text in ['First review', 'Second review', 'Third review']:
+            client.post('/api/predict', json={'text': text}, content_type='application/json')
+        history_store.flush()
+        
+        first = json.loads(client.get('/api/history?limit=2').data)
+        assert first['count'] == 2
+        second = json.loads(client.get(f"/api/history?limit=2&cursor={first['next_cursor']}").data)
+        first_ids = {item['id'] for item in first['items']}
+        assert all(item['id'] not in first_ids for item in second['items'])
+    
+    def test_history_lookup_one_result_per_text(self, client):
+        """Test repeated predictions keep a single cached result per text"""
+        text_hash = app_module.hash_texts([f'repeated review {time.time()}'])[0]
+        for _ in range(3):
+            history_store.record([text_hash], [1], [0.9], 'test')
+        history_store.flush()
+        
+        conn = history_store._connect()
+        results = conn.execute('SELECT COUNT(*) FROM prediction_results WHERE text_hash = ?', (text_hash,)).fetchone()[0]
+        logged = conn.execute('SELECT COUNT(*) FROM predictions WHERE text_hash = ?', (text_hash,)).fetchone()[0]
+        assert results == 1
+        assert logged == 3
+        assert history_store.lookup([text_hash]) == {text_hash: (1, 0.9)}
+    
+    def test_history_logs_distinct_upload_texts(self, client):
+        """Test duplicate rows of an upload are logged once"""
+        text = f'Same review on every row {time.time()}'
+        start = time.time()
+        preds, _ = app_module.predict_sentiment_deduplicated([text] * 20, {})
+        history_store.flush()
+        
+        assert len(preds) == 20
+        items = history_store.query(start=start, limit=500)
+        text_hash = app_module.hash_texts(app_module.normalize_for_model([text]))[0]
+        assert sum(item['text_hash'] == text_hash for item in items) == 1
+    
+    def test_history_invalid_params(self, client):
+        """Test invalid filters are rejected"""
+        assert client.get('/api/history?label=3').status_code == 400
+        assert client.get('/api/history?start=yesterday').status_code == 400
+
+
+class TestSimilarAPI:
+    """Test /api/similar endpoint"""
+    
+    @pytest.fixture
+    def index_dir(self, tmp_path, monkeypatch):
+        """Build a tiny index and point the app at it"""
+        csv_path = tmp_path / 'reviews.csv'
+        csv_path.write_text('text,label\n'
+                            '"A moving story with brilliant acting.",1\n'
+                            '"Dull plot and wooden dialogue.",0\n'
+                            '"The soundtrack alone is worth the ticket.",1\n'
+                            '"I walked out halfway through.",0\n')
+        index_dir = str(tmp_path / 'index')
+        app_module.build_similarity_index(str(csv_path), index_dir)
+        monkeypatch.setattr(app_module, 'SIMILARITY_INDEX_DIR', index_dir)
+        monkeypatch.setattr(app_module, 'similarity_index', None)
+        return index_dir
+    
+    def test_similar_reviews(self, client, index_dir):
+        """Test nearest neighbours are ranked by similarity"""
+        response = client.post('/api/similar',
+                               json={'text': 'Dull plot and wooden dialogue.', 'k': 3},
+                               content_type='application/json')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['index_size'] == 4
+        assert len(data['results']) == 3
+        assert data['results'][0]['text'] == 'Dull plot and wooden dialogue.'
+        assert data['results'][0]['label'] == 0
+        similarities = [r['similarity'] for r in data['results']]
+        assert similarities == sorted(similarities, reverse=True)
+        assert similarities[0] == pytest.approx(1.0, abs=1e-4)
+    
+    def test_similar_without_index(self, client, tmp_path, monkeypatch):
+        """Test a missing index is reported as unavailable"""
+        monkeypatch.setattr(app_module, 'SIMILARITY_INDEX_DIR', str(tmp_path / 'missing'))
+        monkeypatch.setattr(app_module, 'similarity_index', None)
+        response = client.post('/api/similar', json={'text': 'Great movie'}, content_type='application/json')
+        assert response.status_code == 503
+    
+    def test_index_for_other_model_checked_once(self, client, index_dir, monkeypatch):
+        """Test an index built with another model is rejected without reloading it per request"""
+        monkeypatch.setattr(app_module, 'MODEL_VERSION', 'other-model')
+        monkeypatch.setattr(app_module, '_rejected_index_meta', None)
+        loads = []
+        original = app_module.SimilarityIndex.__init__
+        monkeypatch.setattr(app_module.SimilarityIndex, '__init__',
+                            lambda self, path: loads.append(path) or original(self, path))
+        for _ in range(3):
+            response = client.post('/api/similar', json={'text': 'Great movie'}, content_type='application/json')
+            assert response.status_code == 503
+        assert loads == []
+    
+    def test_pca_fitted_on_random_sample(self, tmp_path, monkeypatch):
+        """Test that a CSV sorted by label does not fit the projection on one class"""
+        import numpy as np
+        csv_path = tmp_path / 'sorted.csv'
+        csv_path.write_text('text,label\n' + ''.join(f'neg {i},0\n' for i in range(10))
+                            + ''.join(f'pos {i},1\n' for i in range(10)))
+        hidden = app_module.model.config.hidden_size
+        monkeypatch.setattr(app_module, 'embed_texts',
+                            lambda texts: np.array([[float(t.startswith('pos'))] * hidden for t in texts]))
+        app_module.build_similarity_index(str(csv_path), str(tmp_path / 'index'), dim=0, fit_rows=10)
+        mean = np.load(tmp_path / 'index' / 'mean.npy')
+        assert 0 < mean[0] < 1
+
+
+class TestProfiling:
+    """Test slow-request capture and /api/admin/profiles"""
+    
+    @pytest.fixture
+    def profiling(self, monkeypatch):
+        monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+        monkeypatch.setattr(app_module, 'SLOW_REQUEST_MS', 0)  # Every request counts as slow
+        monkeypatch.setattr(app_module, 'PROFILE_SAMPLE_RATE', 1.0)
+        app_module.captured_profiles.clear()
+    
+    def test_admin_requires_token(self, client, profiling, monkeypatch):
+        """Test that the endpoint is hidden without a token and rejects wrong ones"""
+        assert client.get('/api/admin/profiles', headers={'X-Admin-Token': 'wrong'}).status_code == 401
+        assert client.get('/api/admin/profiles', headers={'Authorization': 'Bearer secret'}).status_code == 200
+        monkeypatch.setattr(app_module, 'ADMIN_TOKEN', '')
+        assert client.get('/api/admin/profiles', headers={'X-Admin-Token': ''}).status_code == 404
+    
+    def test_slow_request_breakdown(self, client, profiling):
+        """Test that a captured profile has stage timings, token counts and stack samples"""
+        # Unique text, so neither the cache nor the history store can answer it
+        text = f'A slow, thoughtful film that rewards patience ({time.time()}). ' * 40
+        response = client.post('/api/predict', json={'text': text}, content_type='application/json')
+        assert response.status_code == 200
+        
+        response = client.get('/api/admin/profiles?endpoint=predict', headers={'X-Admin-Token': 'secret'})
+        assert response.status_code == 200
+        profile = json.loads(response.data)['profiles'][0]
+        assert profile['status'] == 200
+        assert profile['input_bytes'] > len(text)
+        assert profile['batch_sizes'] == [1]
+        assert 0 < profile['tokens'] <= profile['padded_tokens']
+        for stage in ('tokenizer', 'model', 'inference_wait', 'serialization'):
+            assert profile['stages_ms'][stage] >= 0
+        assert profile['stack_samples'] == sum(s['samples'] for s in profile['stacks'])
+    
+    def test_ring_buffer_bounded(self, client, profiling, monkeypatch):
+        """Test that only the newest profiles are kept"""
+        import collections
+        monkeypatch.setattr(app_module, 'captured_profiles', collections.deque(maxlen=2))
+        for _ in range(3):
+            client.get('/api/model-info')
+        data = json.loads(client.get('/api/admin/profiles', headers={'X-Admin-Token': 'secret'}).data)
+        assert data['captured'] == 2
+        assert len(data['profiles']) == 2
+
+
+class TestTokenization:
+    """Test the batched encoding stage used by predict_sentiment"""
+    
+    TEXTS = [
+        'Short and sweet.',
+        '',
+        'A long, winding review that never ends. ' * 200,
+        'x' * 5000,  # No word boundary to trim at
+        'spaced  ' * 600 + 'out',  # Trimmed text would not fill the window
+    ]
+    
+    def test_encode_matches_tokenizer(self):
+        """Test that pre-trimming never changes the token ids"""
+        expected = app_module.tokenizer(self.TEXTS, truncation=True,
+                                        max_length=app_module.MAX_SEQUENCE_LENGTH)['input_ids']
+        assert app_module.encode_texts(self.TEXTS) == expected
+    
+    def test_pack_batch_reuses_buffers(self):
+        """Test padded tensors match the tokenizer and alternate between two buffers"""
+        import torch
+        expected = app_module.tokenizer(self.TEXTS, padding=True, truncation=True,
+                                        max_length=app_module.MAX_SEQUENCE_LENGTH, return_tensors='pt')
+        ids = app_module.encode_texts(self.TEXTS)
+        first = app_module.pack_batch(ids)
+        for key in first:
+            assert torch.equal(first[key], expected[key])
+        second = app_module.pack_batch(ids)
+        third = app_module.pack_batch(ids)
+        assert third['input_ids'].data_ptr() == first['input_ids'].data_ptr()
+        assert second['input_ids'].data_ptr() != first['input_ids'].data_ptr()
+    
+    def test_batches_encoded_as_consumed(self, monkeypatch):
+        """Test that each batch is encoded only once the previous one is in the model"""
+        monkeypatch.setenv('BATCH_SIZE', '2')
+        events = []
+        encode, submit = app_module.encode_texts, app_module.inference_executor.submit
+        monkeypatch.setattr(app_module, 'encode_texts', lambda texts: events.append('encode') or encode(texts))
+        monkeypatch.setattr(app_module.inference_executor, 'submit',
+                            lambda *args, **kwargs: events.append('submit') or submit(*args, **kwargs))
+        preds, probs = app_module.predict_sentiment(self.TEXTS)
+        assert events == ['encode', 'submit'] * 3
+        expected, _ = app_module.predict_token_ids(encode(self.TEXTS))
+        assert preds.tolist() == expected.tolist()
+
+
+class TestSentenceAPI:
+    """Test /api/predict/sentences endpoint"""
+    
+    def test_split_sentences(self):
+        """Test sentence spans over punctuation, HTML line breaks and titles"""
+        text = 'Great film. Mr. Smith was superb!<br /><br />The ending? "Awful." e.g. too long.'
+        spans = app_module.split_sentences(text)
+        assert [text[s:e] for s, e in spans] == [
+            'Great film.', 'Mr. Smith was superb!', 'The ending?', '"Awful." e.g. too long.'
+        ]
+    
+    def test_token_estimate_counts_sentences(self, client):
+        """Test that sentence breakdowns are estimated per sentence, not per truncated review"""
+        review = 'The acting was wonderful and the plot kept me guessing. ' * 200
+        with app.test_request_context('/api/predict/sentences', method='POST', json={'text': review}):
+            sentences = app_module.estimate_tokens(False)
+        with app.test_request_context('/api/predict', method='POST', json={'text': review}):
+            whole = app_module.estimate_tokens(False)
+        assert whole == app_module.MAX_SEQUENCE_LENGTH
+        assert sentences >= len(review) // 4
+    
+    def test_single_review_breakdown(self, client):
+        """Test per-sentence results and aggregate for one review"""
+        text = 'The acting was wonderful. The plot made no sense at all!'
+        response = client.post('/api/predict/sentences', json={'text': text})
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert len(data['sentences']) == 2
+        for sentence in data['sentences']:
+            assert text[sentence['start']:sentence['end']] == sentence['text']
+            assert 0 <= sentence['probability'] <= 1
+        aggregate = data['aggregate']
+        assert aggregate['positive_sentences'] + aggregate['negative_sentences'] == 2
+        assert aggregate['label'] == int(aggregate['probability'] >= 0.5)
+    
+    def test_repeated_sentences_scored_once(self, client):
+        """Test that boilerplate sentences are deduplicated and cached across requests"""
+        boilerplate = f'Spoilers ahead ({time.time()}).'
+        texts = [f'{boilerplate} Loved it.', f'{boilerplate} Hated it.', f'{boilerplate} Loved it.']
+        data = json.loads(client.post('/api/predict/sentences', json={'texts': texts}).data)
+        assert len(data['results']) == 3
+        assert data['unique_sentences'] == 3
+        probs = [r['sentences'][0]['probability'] for r in data['results']]
+        assert probs[0] == probs[1] == probs[2]
+        
+        if app_module.cache_enabled:
+            again = json.loads(client.post('/api/predict/sentences', json={'texts': texts}).data)
+            assert again['cached_sentences'] == again['unique_sentences']
+    
+    def test_invalid_input(self, client):
+        """Test validation errors"""
+        assert client.post('/api/predict/sentences', json={'text': ''}).status_code == 400
+        assert client.post('/api/predict/sentences', json={'texts': []}).status_code == 400
+        assert client.post('/api/predict/sentences', json={'texts': ['Fine film.', '   ']}).status_code == 400
+        too_many = ['Fine.'] * (app_module.SENTENCE_MAX_REVIEWS + 1)
+        assert client.post('/api/predict/sentences', json={'texts': too_many}).status_code == 400
+
+
 class TestMetricsAPI:
     """Test /api/metrics endpoint"""
     
@@ -125,6 +533,64 @@ class TestDatasetAPI:
         assert 'test_samples' in statistics
 
 
+class TestResponseCaching:
+    """Test gzip negotiation, ETags and 304 handling"""
+    
+    def test_gzip_negotiated(self, client):
+        """Test that JSON is gzipped only when the client accepts it"""
+        import gzip
+        plain = client.get('/api/dataset-info')
+        assert 'Content-Encoding' not in plain.headers
+        assert 'Accept-Encoding' in plain.headers['Vary']
+        
+        compressed = client.get('/api/dataset-info', headers={'Accept-Encoding': 'gzip, deflate'})
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(compressed.data)) == json.loads(plain.data)
+        assert compressed.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+    
+    def test_streamed_response_gzip(self):
+        """Test that streamed bodies are compressed chunk by chunk"""
+        import zlib
+        chunks = list(app_module._gzip_stream(iter(['a,b\n', '1,2\n' * 100])))
+        assert len(chunks) == 3
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        assert decoder.decompress(chunks[0]) == b'a,b\n'  # Decodable before the stream ends
+        assert decoder.decompress(b''.join(chunks[1:])) == b'1,2\n' * 100
+    
+    def test_etag_not_modified(self, client):
+        """Test that a matching If-None-Match returns 304 without a body"""
+        first = client.get('/api/model-info')
+        etag = first.headers['ETag']
+        assert 'max-age' in first.headers['Cache-Control']
+        
+        second = client.get('/api/model-info', headers={'If-None-Match': etag})
+        assert second.status_code == 304
+        assert second.data == b''
+        assert second.headers['ETag'] == etag
+        
+        gzipped = client.get('/api/model-info', headers={'If-None-Match': etag[:-1] + '-gzip"'})
+        assert gzipped.status_code == 304
+    
+    def test_etag_tracks_query_and_data(self, client, tmp_path, monkeypatch):
+        """Test that the ETag and the cached body change with the threshold and the dataset"""
+        val_path = tmp_path / 'val.csv'
+        val_path.write_text('text,label\nGreat,1\n')
+        monkeypatch.setenv('VAL_DATA_PATH', str(val_path))
+        low = client.get('/api/metrics?threshold=0.3').headers['ETag']
+        high = client.get('/api/metrics?threshold=0.7').headers['ETag']
+        assert low != high
+        
+        val_path.write_text('text,label\nGreat,1\nAwful,0\n')
+        after = client.get('/api/metrics?threshold=0.3', headers={'If-None-Match': low})
+        assert after.status_code == 200
+        assert after.headers['ETag'] != low
+        assert json.loads(after.data)['label_distribution'] == [1, 1]
+    
+    def test_model_info_weak_etag(self, client):
+        """Test that model info, whose body carries a timestamp, gets a weak ETag"""
+        assert client.get('/api/model-info').headers['ETag'].startswith('W/')
+
+
 class TestStaticFiles:
     """Test static file serving"""
     
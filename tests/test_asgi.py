@@ -0,0 +1,105 @@
+"""
+Unit tests for the ASGI entry point
+"""
+import pytest
+import asyncio
+import json
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app import limiter, REQUEST_TIMEOUT, REQUEST_TIMEOUT_BULK
+from backend.asgi import application, _request_deadline
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Per-IP prediction limits would otherwise carry over between tests"""
+    if limiter:
+        limiter.reset()
+
+
+def call_asgi(method, path, body=b'', headers=None, query_string=b''):
+    """Run one request through the ASGI app and collect the response"""
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': [(k.encode('latin1'), v.encode('latin1')) for k, v in (headers or {}).items()],
+        'client': ('127.0.0.1', 12345),
+        'server': ('testserver', 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    status = sent[0]['status']
+    data = b''.join(m.get('body', b'') for m in sent[1:])
+    return status, dict(sent[0]['headers']), data
+
+
+class TestASGIBridge:
+    """Test backend.asgi:application"""
+
+    def test_health(self):
+        """Test that Flask routes are served unchanged"""
+        status, _, data = call_asgi('GET', '/health')
+        assert status == 200
+        assert json.loads(data)['status'] == 'healthy'
+
+    def test_predict_single_review(self):
+        """Test the prediction response schema matches the Flask app"""
+        body = json.dumps({'text': 'A wonderful film with great acting.'}).encode('utf-8')
+        status, _, data = call_asgi('POST', '/api/predict', body,
+                                    {'content-type': 'application/json', 'content-length': str(len(body))})
+        assert status == 200
+        result = json.loads(data)
+        assert isinstance(result['label'], int)
+        assert 0 <= result['probability'] <= 1
+
+    def test_chunked_request_body(self):
+        """Test that a body sent with Transfer-Encoding: chunked reaches Flask"""
+        body = json.dumps({'text': 'A wonderful film with great acting.'}).encode('utf-8')
+        status, _, data = call_asgi('POST', '/api/predict', body,
+                                    {'content-type': 'application/json', 'transfer-encoding': 'chunked'})
+        assert status == 200
+        assert 0 <= json.loads(data)['probability'] <= 1
+    
+    def test_upload_deadline(self):
+        """Test that CSV uploads get the bulk deadline and clients can only shorten it"""
+        def scope(headers):
+            return {'headers': [(k.encode('latin1'), v.encode('latin1')) for k, v in headers.items()]}
+        upload = {'content-type': 'multipart/form-data; boundary=b'}
+        assert _request_deadline(scope({'content-type': 'application/json'})) == REQUEST_TIMEOUT
+        assert _request_deadline(scope(upload)) == REQUEST_TIMEOUT_BULK
+        assert _request_deadline(scope({**upload, 'x-request-timeout': '5'})) == 5
+        assert _request_deadline(scope({**upload, 'x-request-timeout': '1e9'})) == REQUEST_TIMEOUT_BULK
+    
+    def test_request_deadline(self):
+        """Test that an expired deadline returns 504"""
+        csv = ('text,label\n' + 'Great movie,1\n' * 500).encode('utf-8')
+        body = (b'--b\r\nContent-Disposition: form-data; name="file"; filename="r.csv"\r\n\r\n'
+                + csv + b'\r\n--b--\r\n')
+        status, _, data = call_asgi('POST', '/api/predict', body, {
+            'content-type': 'multipart/form-data; boundary=b',
+            'content-length': str(len(body)),
+            'x-request-timeout': '0.001',
+        })
+        assert status == 504
+        assert 'error' in json.loads(data)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,47 @@
+"""
+Unit tests for the offline bulk scoring script
+"""
+import pytest
+import sys
+import os
+
+import pandas as pd
+
+# Add scripts directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+from bulk_score import read_chunks
+
+
+@pytest.fixture
+def uneven_parquet(tmp_path):
+    """Parquet file with row groups of 100, 100 and 10 rows"""
+    pq = pytest.importorskip('pyarrow.parquet')
+    pa = pytest.importorskip('pyarrow')
+    path = tmp_path / 'reviews.parquet'
+    texts = [f't{i}' for i in range(210)]
+    with pq.ParquetWriter(path, pa.schema([('text', pa.string())])) as writer:
+        for start, end in ((0, 100), (100, 200), (200, 210)):
+            writer.write_table(pa.table({'text': texts[start:end]}))
+    return str(path)
+
+
+class TestReadChunks:
+    """Test resuming input reads in scripts/bulk_score.py"""
+
+    @pytest.mark.parametrize('skip_rows', [0, 100, 150, 205, 210])
+    def test_parquet_resume_uneven_row_groups(self, uneven_parquet, skip_rows):
+        """Test that a resumed read yields exactly the rows after the checkpoint"""
+        texts = [t for frame in read_chunks(uneven_parquet, 30, skip_rows) for t in frame['text']]
+        assert texts == [f't{i}' for i in range(skip_rows, 210)]
+
+    def test_csv_resume_with_quoted_newlines(self, tmp_path):
+        """Test that CSV resume skips records, not file lines"""
+        path = tmp_path / 'reviews.csv'
+        pd.DataFrame({'text': [f'line one\nline two {i}' for i in range(50)]}).to_csv(path, index=False)
+        texts = [t for frame in read_chunks(str(path), 7, 20) for t in frame['text']]
+        assert texts == [f'line one\nline two {i}' for i in range(20, 50)]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])